@@ -3,9 +3,11 @@ import re
 import string
 import sys
 from argparse import ArgumentParser
-from collections import Counter, OrderedDict, namedtuple
+from array import array
+from collections import OrderedDict, namedtuple
 
 RE_NEWLINE = re.compile(r'\r?\n')
+RE_NON_ALPHABETIC = re.compile(r'[^A-Z]')
 
 arg_parser = ArgumentParser(description='Cyphie')
 arg_parser.add_argument('-i', '--input', help='File input')
@@ -22,13 +24,29 @@ def get_ciphertext(args):
     else:
         return sys.stdin.read()
     
-def get_ciphertext_statistics(ciphertext: str, group_size: int = 1):
-    ciphertext = RE_NEWLINE.sub('', ciphertext)
-    l = len(ciphertext)
-    groups = [ciphertext[i:i+group_size] for i in range(0, l, group_size)]
-    c = Counter(groups)
-    
-    return sorted(((ch, freq / l * 100) for ch, freq in c.items()), key=lambda x: x[1], reverse=True)
+def count_grams(ciphertext: str, group_size: int = 1):
+    # every overlapping window, counted in a flat array indexed by its base-26 code
+    letters = RE_NON_ALPHABETIC.sub('', RE_NEWLINE.sub('', ciphertext).upper()).encode('ascii')
+    counts = array('I', bytes(4 * 26 ** group_size))
+    modulus = 26 ** (group_size - 1)
+    code = 0
+    for i, letter in enumerate(letters):
+        code = code % modulus * 26 + letter - ord('A')
+        if i >= group_size - 1:
+            counts[code] += 1
+    return group_size, counts
+
+def code_to_gram(code: int, group_size: int):
+    gram = ''
+    for _ in range(group_size):
+        code, letter = divmod(code, 26)
+        gram = chr(letter + ord('A')) + gram
+    return gram
+
+def get_ciphertext_statistics(gram_counts):
+    group_size, counts = gram_counts
+    l = sum(counts)
+    return sorted(((code_to_gram(code, group_size), freq / l * 100) for code, freq in enumerate(counts) if freq), key=lambda x: x[1], reverse=True)
 
 def print_ciphertext_with_substitutions(ciphertext, substitutions):
     print('-' * 80)
@@ -62,18 +80,18 @@ q: quit
 
 def print_frequencies(frequencies):
     print('Character frequencies:')
-    print_ciphertext_statistics(frequencies.character)
+    print_ciphertext_statistics(get_ciphertext_statistics(frequencies.character))
     print('Digram frequencies:')
-    print_ciphertext_statistics(frequencies.diagram)
+    print_ciphertext_statistics(get_ciphertext_statistics(frequencies.diagram))
     print('Trigram frequencies:')
-    print_ciphertext_statistics(frequencies.trigram)
+    print_ciphertext_statistics(get_ciphertext_statistics(frequencies.trigram))
 
 def main():
     ciphertext = get_ciphertext(args)
     frequencies = Frequencies(
-        character=get_ciphertext_statistics(ciphertext),
-        diagram=get_ciphertext_statistics(ciphertext, 2),
-        trigram=get_ciphertext_statistics(ciphertext, 3)
+        character=count_grams(ciphertext),
+        diagram=count_grams(ciphertext, 2),
+        trigram=count_grams(ciphertext, 3)
     )
     
     print_frequencies(frequencies)
@@ -0,0 +1,44 @@
+import timeit
+
+from ciphie.Ciphie import SAMPLE_CIPHERTEXT, Ciphie
+from ciphie.log_n_grams import LogNGrams, encode
+from ciphie.n_grams import NGrams
+from ciphie.strings import BAR
+
+REPEAT = 5
+NUMBER = 200
+
+
+def time_per_call(statement):
+    return min(timeit.repeat(statement, repeat=REPEAT, number=NUMBER)) / NUMBER
+
+
+def main():
+    ciphertext = Ciphie(SAMPLE_CIPHERTEXT).alphabetic_ciphertext
+    n_grams = NGrams()
+    log_n_grams = LogNGrams()
+    indices = encode(ciphertext)
+    key = encode('qwertyuiopasdfghjklzxcvbnm')
+
+    timings = {
+        'NGrams.score': time_per_call(lambda: n_grams.score(ciphertext)),
+        'LogNGrams.score': time_per_call(lambda: log_n_grams.score(ciphertext)),
+        'LogNGrams.score_key': time_per_call(lambda: log_n_grams.score_key(indices, key)),
+    }
+
+    print(BAR)
+    print(f'sample ciphertext: {len(ciphertext)} letters')
+    baseline = timings['NGrams.score']
+    for name, seconds in timings.items():
+        print(f'{name:<20} {seconds * 1e6:10.1f}us  {baseline / seconds:6.1f}x')
+
+    for fitness in ('frequency', 'log'):
+        ciphie = Ciphie(SAMPLE_CIPHERTEXT, fitness=fitness)
+        seconds = timeit.timeit(ciphie.decode, number=1)
+        print(f'decode ({fitness}): {seconds:.3f}s')
+        print(f'  {SAMPLE_CIPHERTEXT.lower().translate(ciphie.best_key)[:52]}')
+    print(BAR)
+
+
+if __name__ == '__main__':
+    main()
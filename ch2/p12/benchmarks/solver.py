@@ -0,0 +1,174 @@
+import json
+import platform
+import random
+import string
+import subprocess
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from statistics import mean, quantiles
+
+from ciphie.Ciphie import Ciphie
+from ciphie.n_grams import NGramFile, data_folder
+from ciphie.strategies import STRATEGIES, HillClimb, create_strategy
+from ciphie.strings import BAR
+from ciphie.utils import translation_to_key
+
+WORDS_FILE = f'{data_folder}/english_words.txt.zip'
+VOCABULARY_SIZE = 20000
+
+
+def create_arg_parser():
+    arg_parser = ArgumentParser(description='Benchmark the Ciphie solver on synthetic substitution ciphertexts')
+    arg_parser.add_argument('-l', '--lengths', type=int, nargs='+', default=[50, 100, 250, 500, 1000, 2500, 10000], help='Plaintext lengths in letters')
+    arg_parser.add_argument('-n', '--samples', type=int, default=10, help='Ciphertexts per length (default: 10)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='Seed for the plaintexts and keys (default: 0)')
+    arg_parser.add_argument('--corpus', help='Plain text file to cut samples from (default: words drawn from english_words.txt.zip)')
+    arg_parser.add_argument('-f', '--fitness', choices=('frequency', 'log'), default='frequency')
+    arg_parser.add_argument('-s', '--strategy', choices=tuple(STRATEGIES), default=HillClimb.name)
+    arg_parser.add_argument('-w', '--words', action='store_true')
+    arg_parser.add_argument('-o', '--output', default='bench_output.json', help='JSON results file (default: bench_output.json)')
+    arg_parser.add_argument('-b', '--baseline', help='Earlier JSON results file to compare against')
+    return arg_parser
+
+
+class TextGenerator:
+    def __init__(self, corpus=None, seed=0):
+        self.random = random.Random(seed)
+        self.corpus = None
+        if corpus:
+            with open(corpus, 'r') as f:
+                self.corpus = ''.join(ch for ch in f.read().lower() if ch in string.ascii_lowercase)
+        else:
+            self.words, self.weights = self._load_vocabulary()
+
+    @staticmethod
+    def _load_vocabulary():
+        words, weights = [], []
+        with NGramFile(WORDS_FILE) as f:
+            for line, _ in zip(f, range(VOCABULARY_SIZE)):
+                word, count = line.decode('ascii').lower().split()
+                words.append(word)
+                weights.append(int(count))
+        return words, weights
+
+    def generate(self, length):
+        if self.corpus:
+            start = self.random.randrange(max(len(self.corpus) - length, 1))
+            return self.corpus[start:start + length]
+        # words drawn by corpus frequency, which keeps the letter and n-gram statistics english-like
+        text = ''
+        while len(text) < length:
+            text += ''.join(self.random.choices(self.words, self.weights, k=50))
+        return text[:length]
+
+    def encrypt(self, plaintext):
+        key = list(string.ascii_lowercase)
+        self.random.shuffle(key)
+        return plaintext.translate(str.maketrans(string.ascii_lowercase, ''.join(key))), ''.join(key)
+
+
+def get_key_accuracy(plaintext, true_key, found_key):
+    # share of the letters used in the plaintext whose cipher letter decrypts back to them
+    decryption = dict(zip(true_key, string.ascii_lowercase))
+    used = set(plaintext)
+    correct = sum(1 for cipher_ch, plain_ch in zip(string.ascii_lowercase, found_key)
+                  if cipher_ch in decryption and decryption[cipher_ch] in used and decryption[cipher_ch] == plain_ch)
+    return correct / len(used)
+
+
+def get_percentiles(values):
+    if len(values) < 2:
+        return {'p50': values[0], 'p90': values[0], 'p99': values[0]}
+    cuts = quantiles(values, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p90': cuts[89], 'p99': cuts[98]}
+
+
+def solve(ciphertext, args, seed):
+    ciphie = Ciphie(ciphertext, fitness=args.fitness, strategy=create_strategy(args.strategy, seed=seed), words=args.words)
+    start = time.perf_counter()
+    ciphie.decode()
+    return ciphie, time.perf_counter() - start
+
+
+def run_length(generator, length, args):
+    times, accuracies, evaluations = [], [], 0
+    cases = []
+    for sample in range(args.samples):
+        plaintext = generator.generate(length)
+        ciphertext, true_key = generator.encrypt(plaintext)
+        cases.append(ciphertext)
+        ciphie, elapsed = solve(ciphertext, args, sample)
+        times.append(elapsed)
+        evaluations += ciphie.strategy.iterations
+        accuracies.append(get_key_accuracy(plaintext, true_key, translation_to_key(ciphie.best_key)))
+
+    # traced separately, since tracemalloc slows down the solves being timed
+    tracemalloc.start()
+    solve(cases[0], args, 0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'length': length,
+        'samples': args.samples,
+        'key_accuracy': mean(accuracies),
+        'solved': sum(1 for accuracy in accuracies if accuracy == 1) / args.samples,
+        'evaluations_per_second': evaluations / sum(times),
+        'time_to_solution': get_percentiles(times),
+        'peak_memory_bytes': peak,
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline_by_length = {r['length']: r for r in baseline['results']} if baseline else {}
+    print(BAR)
+    print(f"{'length':>7} {'accuracy':>9} {'solved':>7} {'evals/s':>10} {'p50':>8} {'p90':>8} {'p99':>8} {'peak':>9}")
+    for r in results:
+        t = r['time_to_solution']
+        print(
+            f"{r['length']:>7} {r['key_accuracy']:>9.3f} {r['solved']:>7.2f} {r['evaluations_per_second']:>10.0f} "
+            f"{t['p50']:>7.3f}s {t['p90']:>7.3f}s {t['p99']:>7.3f}s {r['peak_memory_bytes'] / 2 ** 20:>7.1f}MB"
+        )
+        old = baseline_by_length.get(r['length'])
+        if old:
+            old_t = old['time_to_solution']
+            print(
+                f"{'vs base':>7} {r['key_accuracy'] - old['key_accuracy']:>+9.3f} {r['solved'] - old['solved']:>+7.2f} "
+                f"{r['evaluations_per_second'] / old['evaluations_per_second']:>9.2f}x "
+                f"{t['p50'] / old_t['p50']:>7.2f}x {t['p90'] / old_t['p90']:>7.2f}x {t['p99'] / old_t['p99']:>7.2f}x"
+            )
+    print(BAR)
+
+
+def main():
+    args = create_arg_parser().parse_args()
+    generator = TextGenerator(args.corpus, args.seed)
+
+    results = [run_length(generator, length, args) for length in args.lengths]
+    report = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'options': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
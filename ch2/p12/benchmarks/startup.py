@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import time
+
+from ciphie.n_grams import NGrams
+from ciphie.strings import BAR
+
+REPEAT = 5
+
+project_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'import ciphie.n_grams': 'import ciphie.n_grams',
+    'first score, text files': (
+        'from ciphie.n_grams import NGrams\n'
+        'NGrams.use_cache = False\n'
+        'NGrams().score("attackatdawn")'
+    ),
+    'first score, binary cache': (
+        'from ciphie.n_grams import NGrams\n'
+        'NGrams().score("attackatdawn")'
+    ),
+    'first log score, text files': (
+        'from ciphie.log_n_grams import LogNGrams\n'
+        'LogNGrams.use_cache = False\n'
+        'LogNGrams().score("attackatdawn")'
+    ),
+    'first log score, binary cache': (
+        'from ciphie.log_n_grams import LogNGrams\n'
+        'LogNGrams().score("attackatdawn")'
+    ),
+}
+
+
+def time_cold_start(code):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=project_folder, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    NGrams.build_cache()
+    try:
+        from ciphie.log_n_grams import LogNGrams
+        LogNGrams.build_cache()
+    except ImportError:
+        pass
+
+    baseline = time_cold_start('pass')
+    print(BAR)
+    print(f'interpreter start: {baseline * 1000:.1f}ms (subtracted below)')
+    for name, code in SCENARIOS.items():
+        try:
+            seconds = time_cold_start(code) - baseline
+        except subprocess.CalledProcessError:
+            print(f'{name:<32} failed')
+            continue
+        print(f'{name:<32} {seconds * 1000:8.1f}ms')
+    print(BAR)
+
+
+if __name__ == '__main__':
+    main()
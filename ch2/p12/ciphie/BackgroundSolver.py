@@ -0,0 +1,122 @@
+import copy
+import random
+import string
+import threading
+from collections import namedtuple
+from typing import Collection, Dict, List, Optional, Tuple
+
+from ciphie.Ciphie import Ciphie
+from ciphie.restarts import perturb_key
+from ciphie.Stats import Stats
+
+# perturbed searches in a row that find nothing better before the solver waits for the next key change
+PATIENCE = 20
+
+Suggestion = namedtuple('Suggestion', ['score', 'translation'])
+
+
+# Keeps searching for a better key on a thread of its own while the REPL waits
+# for input. Every key the user sets is pinned: the search only swaps the other
+# letters, starting from the best key so far and perturbing it between rounds.
+# Work on a key the user has since changed is thrown away, never published.
+class BackgroundSolver:
+    alphabet = string.ascii_lowercase
+
+    def __init__(self, ciphie: Ciphie, seed: int = 0, patience: int = PATIENCE):
+        # a copy of its own, so the search never prints into the REPL or shares its strategy's state
+        self.ciphie = copy.copy(ciphie)
+        self.ciphie.verbose = False
+        self.ciphie.checkpoint = None
+        self.ciphie.strategy = copy.copy(ciphie.strategy)
+        self.ciphie.stats = Stats()
+        self.random = random.Random(seed)
+        self.patience = patience
+
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+        self.version = 0
+        self.key = list(self.alphabet)
+        self.pins = {}
+        self.suggestion: Optional[Suggestion] = None
+        self.searching = False
+        self.thread = threading.Thread(target=self._run, name='ciphie-solver', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.changed.set()
+
+    def update(self, key: List[str], pinned: Collection[str]):
+        # key[i] is the plaintext letter of the i-th cipher letter, as in Key.values
+        pins = {ch: key[ord(ch) - ord('a')] for ch in pinned}
+        with self.lock:
+            self.version += 1
+            self.key = list(key)
+            # a suggestion made under other pins may contradict the new ones
+            if pins != self.pins:
+                self.suggestion = None
+            self.pins = pins
+        self.changed.set()
+
+    def get_suggestion(self) -> Optional[Suggestion]:
+        with self.lock:
+            return self.suggestion
+
+    def complete_key(self, key: List[str], pinned: Collection[str], base: Dict[int, int]) -> Tuple[Dict[int, int], frozenset]:
+        # a full permutation that keeps the pinned letters and fills the rest from base; of
+        # several cipher letters pinned to the same plaintext letter only the first is kept
+        values = [None] * 26
+        used = set()
+        for i, ch in enumerate(self.alphabet):
+            if ch in pinned and key[i] in self.alphabet and key[i] not in used:
+                values[i] = key[i]
+                used.add(key[i])
+        kept = frozenset(ch for ch, value in zip(self.alphabet, values) if value)
+
+        for i, ch in enumerate(self.alphabet):
+            value = chr(base[ord(ch)])
+            if values[i] is None and value not in used:
+                values[i] = value
+                used.add(value)
+        leftover = iter(ch for ch in self.alphabet if ch not in used)
+        values = [value or next(leftover) for value in values]
+        return str.maketrans(self.alphabet, ''.join(values)), kept
+
+    def _run(self):
+        _, initial_key = self.ciphie.guess_initial_key()
+        while True:
+            self.changed.wait()
+            if self.stopped.is_set():
+                return
+            with self.lock:
+                self.changed.clear()
+                version, key, pinned = self.version, self.key, frozenset(self.pins)
+                base = self.suggestion.translation if self.suggestion else initial_key
+            self._refine(version, key, pinned, base)
+
+    def _refine(self, version, key, pinned, base):
+        ciphie = self.ciphie
+        translation, pinned = self.complete_key(key, pinned, base)
+        best = None
+        stale = 0
+        self.searching = True
+        while stale < self.patience and not self.changed.is_set():
+            score = ciphie.score(translation)
+            score, result = ciphie.guess_key_with_swaps(score, translation, pinned)
+            if best is None or score > best[0]:
+                best, stale = (score, result), 0
+                self._publish(version, score, result)
+            else:
+                stale += 1
+            translation = perturb_key(best[1], self.random, pinned)
+        self.searching = False
+
+    def _publish(self, version, score, translation):
+        with self.lock:
+            if version != self.version:
+                return
+            if self.suggestion is None or score > self.suggestion.score:
+                self.suggestion = Suggestion(score, translation)
@@ -0,0 +1,58 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ciphie.n_grams import NGrams
+from ciphie.ScoreCache import ScoreCache
+from ciphie.SwapScorer import SwapScorer
+
+# neighbour rows scored per block, times the number of distinct grams, bounds the gather's memory
+BLOCK_SIZE = 1 << 22
+
+
+# SwapScorer that can also score a whole neighbourhood at once: every neighbour
+# key is a row of a (swaps, 26) permutation matrix, and one gather through it
+# translates all the distinct cipher grams under every key before the table
+# lookup and the weighted sum, both done as array operations.
+class BatchScorer(SwapScorer):
+    def __init__(self, n_grams: NGrams, ciphertext: str, cache: Optional[ScoreCache] = None):
+        super().__init__(n_grams, ciphertext, cache)
+        self.arrays = {}
+        for n in self.sizes:
+            log_probabilities = getattr(n_grams[n], 'log_probabilities', None)
+            table = np.asarray(log_probabilities if log_probabilities is not None else self.tables[n], dtype=np.float64)
+            grams = np.array(self.grams[n], dtype=np.int64).reshape(-1, n)
+            counts = np.array(self.counts[n], dtype=np.float64)
+            self.arrays[n] = (table, grams, counts)
+
+    def get_neighbour_keys(self, swaps: List[Tuple[int, int]]) -> np.ndarray:
+        key = np.array(self.key, dtype=np.int64)
+        letters = np.array([ord(ch) - ord('a') for ch in self.cipher_alphabet], dtype=np.int64)
+        swaps = np.asarray(swaps, dtype=np.int64).reshape(-1, 2)
+        a, b = letters[swaps[:, 0]], letters[swaps[:, 1]]
+        rows = np.arange(len(swaps))
+        keys = np.tile(key, (len(swaps), 1))
+        keys[rows, a] = key[b]
+        keys[rows, b] = key[a]
+        return keys
+
+    def score_keys(self, keys: np.ndarray) -> np.ndarray:
+        scores = np.zeros(len(keys))
+        for n in self.sizes:
+            table, grams, counts = self.arrays[n]
+            if not len(grams):
+                continue
+            rows = max(BLOCK_SIZE // len(grams), 1)
+            for start in range(0, len(keys), rows):
+                block = keys[start:start + rows]
+                codes = np.zeros((len(block), len(grams)), dtype=np.int64)
+                for k in range(n):
+                    codes = codes * 26 + block[:, grams[:, k]]
+                scores[start:start + rows] += self.weights[n] * (table[codes] @ counts)
+        return scores
+
+    def neighbour_deltas(self, swaps: List[Tuple[int, int]]) -> np.ndarray:
+        # score change of every swap in swaps, in the same order
+        if not swaps:
+            return np.zeros(0)
+        return self.score_keys(self.get_neighbour_keys(swaps)) - self.score
@@ -0,0 +1,41 @@
+import json
+from typing import Optional
+
+from ciphie.n_gram_cache import write_atomic
+
+# bump whenever the fields below change so old checkpoints are not resumed
+CHECKPOINT_VERSION = 3
+
+
+# Periodic snapshot of a key search: the ciphertext it is for, the current and
+# best key, the keys evaluated and seconds spent so far, the strategy's random
+# state and whatever else it needs, such as the annealing temperature scale, so
+# an interrupted search can carry on where it stopped, within the same limits.
+# The file is small JSON, replaced atomically, so an interruption mid-write
+# leaves the previous one.
+class Checkpoint:
+    def __init__(self, path: str, interval: float = 30.0, resume: bool = False):
+        self.path = path
+        self.interval = interval
+        # the state to continue from, if resuming from an existing checkpoint
+        self.state = self.read() if resume else None
+
+    def read(self) -> Optional[dict]:
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('version') != CHECKPOINT_VERSION:
+            return None
+        # json has no tuples, which random.setstate needs
+        version, internal_state, gauss_next = state['random_state']
+        state['random_state'] = (version, tuple(internal_state), gauss_next)
+        return state
+
+    def write(self, state: dict):
+        write_atomic(self.path, json.dumps({'version': CHECKPOINT_VERSION, **state}).encode('ascii'))
+
+    def matches(self, digest: str, fitness: str, strategy: str) -> bool:
+        state = self.state
+        return state['digest'] == digest and state['fitness'] == fitness and state['strategy'] == strategy
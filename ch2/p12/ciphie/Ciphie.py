@@ -1,24 +1,74 @@
+import math
 import os
 import re
 import string
 import time
-from typing import List
+from typing import Collection, List, Optional
 
+from ciphie.Checkpoint import Checkpoint
 from ciphie.n_grams import Frequencies, NGrams
+from ciphie.PatternIndex import PatternIndex
+from ciphie.ResultCache import ResultCache, get_digest
+from ciphie.ScoreCache import ScoreCache
+from ciphie.Stats import Stats
+from ciphie.strategies import SWAPS, HillClimb, SearchStrategy, Swaps, get_free_swaps
 from ciphie.strings import BAR
-from ciphie.utils import chr_list_to_str, list_to_str
+from ciphie.SwapScorer import SwapScorer
+from ciphie.utils import chr_list_to_str, list_to_str, translation_to_key
+from ciphie.WordAutomaton import WordAutomaton
 
 RE_NON_ALPHABETIC = re.compile(r'[^a-z]')
+RE_WORD = re.compile(r'[a-z]+')
+
+SAMPLE_CIPHERTEXT = """GBSXUCGSZQGKGSQPKQKGLSKASPCGBGBKGUKGCEUKUZKGGBSQEICA
+CGKGCEUERWKLKUPKQQGCIICUAEUVSHQKGCEUPCGBCGQOEVSHUNSU
+GKUZCGQSNLSHEHIEEDCUOGEPKHZGBSNKCUGSUKUASERLSKASCUGB
+SLKACRCACUZSSZEUSBEXHKRGSHWKLKUSQSKCHQTXKZHEUQBKZAEN
+NSUASZFENFCUOCUEKBXGBSWKLKUSQSKNFKQQKZEHGEGBSXUCGSZQ
+GKGSQKUZBCQAEIISKOXSZSICVSHSZGEGBSQSAHSGKHMERQGKGSKR
+EHNKIHSLIMGEKHSASUGKNSHCAKUNSQQKOSPBCISGBCQHSLIMQGKG
+SZGBKGCGQSSNSZXQSISQQGEAEUGCUXSGBSSJCQGCUOZCLIENKGCA
+USOEGCKGCEUQCGAEUGKCUSZUEGBHSKGEHBCUGERPKHEHKHNSZKGGKAD
+"""
 
 class Ciphie:
     alphabet = string.ascii_lowercase
 
-    def __init__(self, ciphertext, verbose=False):
+    def __init__(self, ciphertext, verbose=False, fitness='frequency', strategy: Optional[SearchStrategy] = None,
+                 words=False, word_weight=0.2, frequencies: Optional[Frequencies] = None,
+                 score_cache_size: int = 16 * 2 ** 20, patterns=False, result_cache: Optional[ResultCache] = None,
+                 checkpoint: Optional[Checkpoint] = None):
         self.best_key = string.ascii_lowercase
         self.verbose = verbose
+        self.fitness = fitness
+        self.strategy = strategy or HillClimb()
+        # word_weight is the share of the n-gram score that full dictionary coverage is worth
+        self.words = words
+        self.word_weight = word_weight
+        # spaced ciphertexts can have the letters their word patterns pin down solved up front
+        self.patterns = patterns
         self.ciphertext = ciphertext.lower()
         self.alphabetic_ciphertext = RE_NON_ALPHABETIC.sub('', self.ciphertext)
-        self.n_grams = NGrams()
+        # streamed inputs pass the exact statistics of the whole input alongside a sample of it
+        self.frequencies = frequencies or Frequencies(self.alphabetic_ciphertext)
+        self.n_grams = self.create_n_grams(fitness)
+        # scores of keys already tried, shared by every search on this ciphertext
+        self.score_cache = ScoreCache(score_cache_size) if score_cache_size else None
+        # keys found in earlier runs, kept on disk
+        self.result_cache = result_cache
+        # where the state of a long search is saved, and possibly resumed from
+        self.checkpoint = checkpoint
+        # set when a search of the last decode stopped on --max-iterations or --time-limit
+        self.cut_short = False
+        self.stats = Stats()
+
+    @staticmethod
+    def create_n_grams(fitness='frequency') -> NGrams:
+        if fitness == 'log':
+            # numpy is only needed for the log-probability tables
+            from ciphie.log_n_grams import LogNGrams
+            return LogNGrams()
+        return NGrams()
 
     def _report(self, ciphertext, score, translation):
         if not self.verbose:
@@ -39,11 +89,13 @@ class Ciphie:
         return os.linesep.join(buffer)
 
     def report(self, score=None, key=None):
+        if not self.verbose:
+            return
         print(self._report(self.ciphertext, score or self.best_score, key or self.best_key))
 
     @staticmethod
-    def get_cipher_alphabet_in_frequency_order(ciphertext: str) -> List[str]:
-        cipher_alphabet_in_frequency_order = list(Frequencies.get_ciphertext_statistics(ciphertext, 1).keys())
+    def get_cipher_alphabet_in_frequency_order(frequencies: Frequencies) -> List[str]:
+        cipher_alphabet_in_frequency_order = list(frequencies.monograms.keys())
 
         # ensure all letters are present
         for ch in string.ascii_lowercase:
@@ -53,49 +105,245 @@ class Ciphie:
         return cipher_alphabet_in_frequency_order
     
     def guess_initial_key(self):
-        cipher_alphabet_in_frequency_order = self.get_cipher_alphabet_in_frequency_order(self.alphabetic_ciphertext)
+        cipher_alphabet_in_frequency_order = self.get_cipher_alphabet_in_frequency_order(self.frequencies)
         common_alphabet_in_frequency_order = self.n_grams.get_common_alphabet_in_frequency_order()
 
         best_key = str.maketrans(
             list_to_str(cipher_alphabet_in_frequency_order),
             list_to_str(common_alphabet_in_frequency_order)
         )
+        best_score = self.score(best_key)
 
-        decoded = self.alphabetic_ciphertext.translate(best_key)
-        best_score = self.n_grams.score(decoded)
+        # a key recovered recently is likely reused, and then scores far above the frequency order
+        if self.result_cache is not None:
+            warm_start = False
+            for key in self.result_cache.keys:
+                translation = str.maketrans(self.alphabet, key)
+                score = self.score(translation)
+                if score > best_score:
+                    best_score, best_key, warm_start = score, translation, True
+            self.result_cache.warm_starts += warm_start
 
         return best_score, best_key
+
+    def get_search_options(self, restarts=1) -> dict:
+        # everything that changes which key a decode ends with, stored with it in the result cache
+        strategy = self.strategy
+        options = {name: getattr(strategy, name) for name in strategy.options if name != 'seed'}
+        return {
+            'fitness': self.fitness,
+            'strategy': strategy.name,
+            **options,
+            'words': self.word_weight if self.words else None,
+            'patterns': self.patterns,
+            'restarts': restarts,
+        }
+
+    def score(self, translation) -> float:
+        self.stats.count('translations')
+        decoded = self.alphabetic_ciphertext.translate(translation)
+        with self.stats.phase('scoring'):
+            return self.n_grams.score(decoded)
         
-    def guess_key_with_swaps(self, best_score, best_key_translations):
+    def guess_key_with_patterns(self, translation):
+        # sets the letters that the dictionary words matching the ciphertext's word patterns
+        # agree on, keeping the rest of the key; returns the key and the letters set
+        solved = PatternIndex.load().solve(RE_WORD.findall(self.ciphertext))
+        cipher_alphabet = chr_list_to_str(translation.keys())
+        key = list(chr_list_to_str(translation.values()))
+        for cipher_ch, plain_ch in solved.items():
+            i, j = cipher_alphabet.index(cipher_ch), key.index(plain_ch)
+            key[i], key[j] = key[j], key[i]
+        self.stats.count('pattern letters', len(solved))
+        if self.verbose:
+            print(f'patterns: {len(solved)} letters solved ({"".join(sorted(solved))})')
+        return str.maketrans(cipher_alphabet, list_to_str(key)), set(solved)
+
+    def guess_key_with_swaps(self, best_score, best_key_translations, pinned: Collection[str] = ()):
+        # pinned cipher letters keep the plaintext letter they have in best_key_translations
         cipher_alphabet = chr_list_to_str(best_key_translations.keys())
         best_key = chr_list_to_str(best_key_translations.values())
-        alphabet_length = len(string.ascii_lowercase)
+        swaps = get_free_swaps(cipher_alphabet, pinned) if pinned else SWAPS
+
+        scorer_class = SwapScorer
+        if self.strategy.batched:
+            # numpy is only needed for batched neighbourhood scoring
+            from ciphie.BatchScorer import BatchScorer
+            scorer_class = BatchScorer
+
+        stats = self.stats
+        with stats.phase('scorer setup'):
+            scorer = scorer_class(self.n_grams, self.alphabetic_ciphertext, self.score_cache)
+            scorer.set_key(cipher_alphabet, best_key)
+        stats.record_score(scorer.score, 'start')
+
+        # best key seen, kept for checkpoints; a resumed search starts with the best it had found
+        best = [scorer.score, scorer.get_key()]
+        resumed = self.checkpoint.state if self.checkpoint is not None else None
+        if resumed is not None and resumed['best_score'] > best[0]:
+            best = [resumed['best_score'], resumed['best_key']]
+
+        def report(score, key):
+            stats.record_score(score, self.strategy.name)
+            if score > best[0]:
+                best[:] = score, key
+            if self.verbose:
+                self.report(score, str.maketrans(cipher_alphabet, key))
+
+        def save_checkpoint(finished=False):
+            self.checkpoint.write({
+                'digest': get_digest(self.alphabetic_ciphertext),
+                'fitness': self.fitness,
+                'strategy': self.strategy.name,
+                'cipher_alphabet': cipher_alphabet,
+                'pinned': sorted(pinned),
+                'key': scorer.get_key(),
+                'best_key': best[1],
+                'best_score': best[0],
+                'iterations': self.strategy.iterations,
+                'elapsed': self.strategy.elapsed,
+                'random_state': self.strategy.random.getstate(),
+                'strategy_state': self.strategy.get_state(),
+                'finished': finished,
+            })
+            stats.count('checkpoints')
+
+        cache = self.score_cache
+        cache_hits, cache_misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+        self.strategy.stats = stats
+        if self.checkpoint is not None:
+            self.strategy.checkpoint = save_checkpoint
+            self.strategy.checkpoint_interval = self.checkpoint.interval
+        try:
+            with stats.phase('search'):
+                best_score = self.strategy.search(scorer, report, swaps)
+        except KeyboardInterrupt:
+            if self.checkpoint is not None:
+                save_checkpoint()
+            raise
+        finally:
+            self.strategy.checkpoint = None
+        self.cut_short = self.cut_short or self.strategy.cut_short
+        if best[0] > best_score:
+            # the search resumed from a key worse than the best found before it was interrupted
+            best_score = scorer.set_key(cipher_alphabet, best[1])
+        stats.count('keys evaluated', self.strategy.iterations)
+        if cache is not None:
+            stats.count('cache hits', cache.hits - cache_hits)
+            stats.count('cache misses', cache.misses - cache_misses)
+        if self.verbose:
+            print(f'{self.strategy.name}: {self.strategy.iterations} keys evaluated')
+            if self.score_cache is not None:
+                print(self.score_cache)
+        if self.words:
+            with stats.phase('words'):
+                best_score = self.guess_key_with_words(scorer, report, swaps)
+        stats.count('accepted swaps', scorer.swaps)
+        if self.checkpoint is not None:
+            best[:] = best_score, scorer.get_key()
+            save_checkpoint(finished=True)
+
+        return best_score, str.maketrans(cipher_alphabet, scorer.get_key())
+
+    def guess_key_with_words(self, scorer: SwapScorer, report, swaps: Swaps = SWAPS):
+        # once the n-grams have settled, climb on n-gram score plus dictionary word coverage
+        automaton = WordAutomaton.load()
+        cipher_alphabet = scorer.cipher_alphabet
+        weight = self.word_weight * abs(scorer.score)
+
+        def get_coverage(key):
+            self.stats.count('translations')
+            return automaton.coverage(self.alphabetic_ciphertext.translate(str.maketrans(cipher_alphabet, key)))
+
+        coverage = get_coverage(scorer.get_key())
         improvement = True
-        
+        evaluations = 0
         while improvement:
             improvement = False
-            for i in range(alphabet_length):
-                for j in range(i + 1, alphabet_length):
-                    current_key = list(best_key)
-                    current_key[i], current_key[j] = current_key[j], current_key[i]
-                    current_key = ''.join(current_key)
-
-                    translation = str.maketrans(cipher_alphabet, current_key)
-                    decoded = self.alphabetic_ciphertext.translate(translation)
-                    score = self.n_grams.score(decoded)
-                    if score > best_score:
-                        improvement = True
-                        best_score = score
-                        best_key = current_key
-                        self.report(best_score, translation)
-        
-        return best_score, str.maketrans(cipher_alphabet, current_key)
+            for i, j in swaps:
+                # the climb shares the search's --max-iterations and --time-limit
+                if not self.strategy.spend():
+                    improvement = False
+                    break
+                delta = scorer.swap_delta(i, j)
+                # no word gain can make up for this much n-gram loss
+                if delta + weight * (1 - coverage) <= 0:
+                    continue
+
+                key = list(scorer.get_key())
+                key[i], key[j] = key[j], key[i]
+                key = list_to_str(key)
+                evaluations += 1
+                key_coverage = get_coverage(key)
+                if delta + weight * (key_coverage - coverage) > 0:
+                    improvement = True
+                    scorer.swap(i, j)
+                    coverage = key_coverage
+                    report(scorer.score, key)
+
+        if self.verbose:
+            print(f'words: {evaluations} keys evaluated, {round(coverage * 100, 1)}% of letters in dictionary words')
+        return scorer.score
 
-    def decode(self):
+    def decode(self, restarts=1, jobs=1, seed=0):
         start = time.time()
-        self.best_score, self.best_key = self.guess_initial_key()
-        self.report()
-        self.best_score, self.best_key = self.guess_key_with_swaps(self.best_score, self.best_key)
+        self.stats = Stats()
+        with self.stats.phase('n-gram load'):
+            self.n_grams.load()
+        self.cut_short = False
+        options = self.get_search_options(restarts)
+        resumed = self.checkpoint.state if self.checkpoint is not None else None
+        cached = None
+        trusted = False
+        # a resumed search is carried on even if the ciphertext was solved before
+        if self.result_cache is not None and resumed is None:
+            cached = self.result_cache.get(self.alphabetic_ciphertext)
+        if cached is not None:
+            self.best_key = str.maketrans(self.alphabet, cached['key'])
+            self.best_score = self.score(self.best_key)
+            trusted = cached['options'] == options and math.isclose(self.best_score, cached['score'])
+            if not trusted:
+                # found by another kind of search, or scored by other tables, so it is only a
+                # starting point that this search climbs from once
+                self.result_cache.warm_starts += 1
+                self.report()
+                self.best_score, self.best_key = self.guess_key_with_swaps(self.best_score, self.best_key)
+        elif restarts > 1:
+            from ciphie.restarts import decode_with_restarts
+            with self.stats.phase('restarts'):
+                decode_with_restarts(self, restarts, jobs, seed)
+        else:
+            if resumed is not None:
+                # carry on from the key the interrupted search was at
+                self.best_key = str.maketrans(resumed['cipher_alphabet'], resumed['key'])
+                self.best_score = self.score(self.best_key)
+                pinned = set(resumed['pinned'])
+                self.strategy.resume(resumed['iterations'], resumed['random_state'], resumed['elapsed'],
+                                     resumed['strategy_state'])
+            else:
+                with self.stats.phase('initial key'):
+                    self.best_score, self.best_key = self.guess_initial_key()
+                pinned = ()
+                if self.patterns:
+                    with self.stats.phase('patterns'):
+                        self.best_key, pinned = self.guess_key_with_patterns(self.best_key)
+                    self.best_score = self.score(self.best_key)
+            self.report()
+            if resumed is not None and resumed['finished']:
+                self.best_key = str.maketrans(resumed['cipher_alphabet'], resumed['best_key'])
+                self.best_score = self.score(self.best_key)
+            else:
+                self.best_score, self.best_key = self.guess_key_with_swaps(self.best_score, self.best_key, pinned)
+            if resumed is not None:
+                self.checkpoint.state = None
+        if self.result_cache is not None:
+            # a search stopped early may not have found the key, and would be trusted by later runs
+            if not trusted and not self.cut_short:
+                self.result_cache.put(self.alphabetic_ciphertext, translation_to_key(self.best_key),
+                                      self.best_score, options)
+            self.result_cache.save()
+            if self.verbose:
+                print(self.result_cache)
         self.report()
         end = time.time()
         if self.verbose:
@@ -104,15 +352,4 @@ class Ciphie:
 
 
 if __name__ == '__main__':
-    ciphertext = """GBSXUCGSZQGKGSQPKQKGLSKASPCGBGBKGUKGCEUKUZKGGBSQEICA
-CGKGCEUERWKLKUPKQQGCIICUAEUVSHQKGCEUPCGBCGQOEVSHUNSU
-GKUZCGQSNLSHEHIEEDCUOGEPKHZGBSNKCUGSUKUASERLSKASCUGB
-SLKACRCACUZSSZEUSBEXHKRGSHWKLKUSQSKCHQTXKZHEUQBKZAEN
-NSUASZFENFCUOCUEKBXGBSWKLKUSQSKNFKQQKZEHGEGBSXUCGSZQ
-GKGSQKUZBCQAEIISKOXSZSICVSHSZGEGBSQSAHSGKHMERQGKGSKR
-EHNKIHSLIMGEKHSASUGKNSHCAKUNSQQKOSPBCISGBCQHSLIMQGKG
-SZGBKGCGQSSNSZXQSISQQGEAEUGCUXSGBSSJCQGCUOZCLIENKGCA
-USOEGCKGCEUQCGAEUGKCUSZUEGBHSKGEHBCUGERPKHEHKHNSZKGGKAD
-"""
-
-    Ciphie(ciphertext).decode()
+    Ciphie(SAMPLE_CIPHERTEXT).decode()
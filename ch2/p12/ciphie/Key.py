@@ -1,51 +1,54 @@
 import os
 import string
-from collections import OrderedDict
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from ciphie.utils import list_to_str
 
 
-class KeyChar(str):
-    def __init__(self, key: str):
-        self.key = key
-
-    def __hash__(self):
-        return hash(self.key.casefold())
-
-    def __eq__(self, other):
-        return self.key.casefold() == other.key.casefold()
-
-    def __str__(self):
-        return self.key
-
-    def __repr__(self):
-        return self.key
-
-
+# Substitution key kept both ways: a 26-slot forward array of plaintext letters
+# and an inverse map from each plaintext letter to the cipher letters using it,
+# updated in place so lookups in either direction never scan the whole key.
 class Key:
+    alphabet = string.ascii_lowercase
+
     def __init__(self, translation: Optional[Dict[int, int]] = None):
-        self.value = OrderedDict({
-            KeyChar(ch): ch for ch in string.ascii_lowercase
-        })
+        self.values = list(string.ascii_lowercase)
+        self.inverse = {ch: {ch} for ch in string.ascii_lowercase}
+        # ready for str.translate, kept in step with values
+        self.table = {ord(ch): ord(ch) for ch in string.ascii_lowercase}
 
         if translation:
             for k, v in translation.items():
                 self.update(chr(k), chr(v))
 
+    @staticmethod
+    def _index(key: str) -> int:
+        index = ord(key.lower()) - ord('a')
+        if not 0 <= index < 26:
+            raise ValueError(f'"{key}" is not a letter')
+        return index
+
     def update(self, key: str, val: str):
-        self.value[KeyChar(key)] = val.lower()
+        index = self._index(key)
+        key = string.ascii_lowercase[index]
+        val = val.lower()
+
+        old = self.values[index]
+        keys = self.inverse[old]
+        keys.discard(key)
+        if not keys:
+            del self.inverse[old]
+
+        self.values[index] = val
+        self.inverse.setdefault(val, set()).add(key)
+        self.table[ord(key)] = ord(val)
 
     def translate(self, ch: str):
-        return self.value.get(KeyChar(ch), ch)
+        index = ord(ch.lower()) - ord('a') if len(ch) == 1 else -1
+        return self.values[index] if 0 <= index < 26 else ch
 
-    def get_translations(self, ch: str):
-        ch = ch.lower()
-        keys = []
-        for k, v in self.value.items():
-            if v == ch:
-                keys.append(k)
-        return keys
+    def get_translations(self, ch: str) -> List[str]:
+        return sorted(self.inverse.get(ch.lower(), ()))
 
     def __str__(self):
-        return list_to_str(self.value.keys()) + os.linesep + list_to_str(self.value.values())
\ No newline at end of file
+        return string.ascii_lowercase + os.linesep + list_to_str(self.values)
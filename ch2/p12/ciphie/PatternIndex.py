@@ -0,0 +1,142 @@
+import os
+import struct
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Set
+
+from ciphie.n_gram_cache import CACHE_VERSION, get_cache_path, is_fresh, write_atomic
+from ciphie.n_grams import NGramFile, data_folder
+
+MAGIC = b'CPHP'
+
+# magic, version, number of words, number of patterns; followed by zlib compressed
+# lines of a pattern and the words that have it, most common first
+HEADER = struct.Struct('<4sHII')
+
+
+def get_pattern(word: str) -> str:
+    # letters numbered in order of first appearance, so "that" and "high" are both ABCA
+    letters = {}
+    return ''.join(letters.setdefault(ch, chr(ord('A') + len(letters))) for ch in word)
+
+
+# Index from letter repetition pattern to the dictionary words that have it. Since a
+# substitution keeps the pattern of every word, the words of a spaced ciphertext can
+# only decrypt to the words listed under their pattern.
+class PatternIndex:
+    filename = os.path.join(data_folder, 'english_words.txt.zip')
+    _default = None
+
+    def __init__(self, max_words=50000, use_cache=True):
+        self.max_words = max_words
+        self.patterns = self._load(use_cache)
+
+    @classmethod
+    def load(cls):
+        # shared index over the default word list, built or read on first use
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def get_cache_path(self):
+        return get_cache_path(self.filename, f'.{self.max_words}.pat')
+
+    def _load(self, use_cache):
+        path = self.get_cache_path()
+        if use_cache and is_fresh(self.filename, path):
+            cached = self._read(path)
+            if cached:
+                return cached
+
+        patterns = self.build(self.get_words())
+        if use_cache:
+            try:
+                self._write(path, patterns)
+            except OSError:
+                pass
+        return patterns
+
+    def get_words(self):
+        words = []
+        with NGramFile(self.filename) as f:
+            for line in f:
+                if len(words) >= self.max_words:
+                    break
+                word = line.split(b' ')[0].strip().decode('ascii').lower()
+                if word.isalpha():
+                    words.append(word)
+        return words
+
+    @staticmethod
+    def build(words) -> Dict[str, List[str]]:
+        patterns = defaultdict(list)
+        for word in words:
+            patterns[get_pattern(word)].append(word)
+        return dict(patterns)
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, words, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != CACHE_VERSION or words != self.max_words:
+            return None
+        patterns = {}
+        for line in zlib.decompress(data[HEADER.size:]).decode('ascii').splitlines():
+            pattern, *pattern_words = line.split(' ')
+            patterns[pattern] = pattern_words
+        return patterns if len(patterns) == count else None
+
+    def _write(self, path, patterns):
+        lines = '\n'.join(' '.join((pattern, *words)) for pattern, words in patterns.items())
+        header = HEADER.pack(MAGIC, CACHE_VERSION, self.max_words, len(patterns))
+        write_atomic(path, header + zlib.compress(lines.encode('ascii'), 9))
+
+    def get_candidates(self, word: str) -> List[str]:
+        return self.patterns.get(get_pattern(word), [])
+
+    def solve(self, cipher_words: List[str]) -> Dict[str, str]:
+        # Constraint propagation over the candidate words of every cipher word: each cipher
+        # letter keeps the set of plaintext letters some remaining candidate puts there,
+        # candidates that disagree with those sets are dropped, and a letter down to one
+        # possibility takes it away from every other letter, until nothing changes. Words
+        # are added most constraining first; one that leaves a letter or a word without
+        # possibilities is most likely missing from the dictionary and is skipped.
+        words = {word: self.get_candidates(word) for word in set(cipher_words)}
+        candidates, domains = {}, {}
+        for word in sorted((w for w in words if words[w]), key=lambda w: (len(words[w]), -len(set(w)))):
+            result = _propagate({**candidates, word: words[word]}, domains)
+            if result is not None:
+                candidates, domains = result
+        return {ch: next(iter(plain)) for ch, plain in domains.items() if len(plain) == 1}
+
+
+def _propagate(candidates: Dict[str, List[str]], domains: Dict[str, Set[str]]):
+    # the candidates and domains narrowed to a fixed point, or None on a contradiction
+    candidates = dict(candidates)
+    domains = {ch: set(plain) for ch, plain in domains.items()}
+    changed = True
+    while changed:
+        changed = False
+        for word, words in candidates.items():
+            remaining = [w for w in words if all(ch not in domains or p in domains[ch] for ch, p in zip(word, w))]
+            if not remaining:
+                return None
+            candidates[word] = remaining
+            for i, ch in enumerate(word):
+                plain = {w[i] for w in remaining}
+                domain = domains.get(ch)
+                if domain is None or not domain <= plain:
+                    domains[ch] = plain if domain is None else domain & plain
+                    if not domains[ch]:
+                        return None
+                    changed = True
+
+        solved = {ch: next(iter(plain)) for ch, plain in domains.items() if len(plain) == 1}
+        for ch, plain in domains.items():
+            taken = {p for other, p in solved.items() if other != ch}
+            if plain & taken:
+                plain -= taken
+                if not plain:
+                    return None
+                changed = True
+    return candidates, domains
@@ -0,0 +1,90 @@
+import os
+import shutil
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from ciphie import colors
+from ciphie.Highlighter import Highlighter
+from ciphie.Key import Key
+
+
+# Renders the ciphertext under the current key one display row at a time. Rows
+# are translated in bulk with str.translate, highlight colors are only spliced
+# in at the positions of highlighted letters, and each rendered row is cached
+# until a key or highlight change touches one of the letters in it.
+class Renderer:
+    def __init__(self, ciphertext: str, key: Key, highlighter: Highlighter, width: Optional[int] = None):
+        self.key = key
+        self.highlighter = highlighter
+        self.width = width or shutil.get_terminal_size().columns
+
+        # rows no wider than the terminal, so a cached row is also what the terminal shows on one line
+        self.rows = []
+        for line in ciphertext.split('\n'):
+            self.rows.extend(line[start:start + self.width] for start in range(0, max(len(line), 1), self.width))
+        # the empty row after a final newline is printed with the ciphertext but has nothing to overlay
+        self.overlay_rows = len(self.rows) - 1 if ciphertext.endswith('\n') else len(self.rows)
+
+        self.letters = [frozenset(row.upper()) for row in self.rows]
+        self.rows_by_letter = defaultdict(list)
+        for i, letters in enumerate(self.letters):
+            for ch in letters:
+                self.rows_by_letter[ch].append(i)
+
+        self.positions: List[Optional[Dict[str, List[int]]]] = [None] * len(self.rows)
+        self.rendered: List[Optional[str]] = [None] * len(self.rows)
+
+    def invalidate(self, *letters: str):
+        for ch in letters:
+            for i in self.rows_by_letter.get(ch.upper(), ()):
+                self.rendered[i] = None
+
+    def _get_positions(self, i: int) -> Dict[str, List[int]]:
+        # built the first time a highlight falls on the row
+        if self.positions[i] is None:
+            positions = defaultdict(list)
+            for position, ch in enumerate(self.rows[i]):
+                positions[ch.upper()].append(position)
+            self.positions[i] = positions
+        return self.positions[i]
+
+    def _render(self, i: int) -> str:
+        row = self.rows[i]
+        translated = row.translate(self.key.table)
+        letters = self.letters[i]
+        highlighted = [(ch, color) for ch, color in self.highlighter.highlight_map.items() if ch in letters]
+        if not highlighted:
+            return translated
+
+        chars = list(translated)
+        positions = self._get_positions(i)
+        for ch, color in highlighted:
+            for position in positions.get(ch, ()):
+                chars[position] = color + chars[position] + colors.ENDC
+        return ''.join(chars)
+
+    def render_row(self, i: int) -> str:
+        if self.rendered[i] is None:
+            self.rendered[i] = self._render(i)
+        return self.rendered[i]
+
+    def get_page(self, page: int, page_size: Optional[int]):
+        # row range of a page, or every row without paging
+        if not page_size:
+            return range(len(self.rows))
+        return range(page * page_size, min((page + 1) * page_size, len(self.rows)))
+
+    def get_page_count(self, page_size: Optional[int]) -> int:
+        return -(-len(self.rows) // page_size) if page_size else 1
+
+    def render(self, rows: range) -> str:
+        return '\n'.join(self.render_row(i) for i in rows)
+
+    def render_overlay(self, rows: range) -> str:
+        buffer = []
+        for i in rows:
+            if i >= self.overlay_rows:
+                break
+            buffer.append(f'{colors.UNDERLINE}{self.rows[i]}{colors.ENDC}')
+            buffer.append(self.render_row(i))
+        return os.linesep.join(buffer)
@@ -3,12 +3,12 @@ import traceback
 from typing import Dict, Optional
 
 from ciphie import colors
+from ciphie.BackgroundSolver import BackgroundSolver
 from ciphie.Ciphie import Ciphie
 from ciphie.Highlighter import Highlighter
 from ciphie.Key import Key
-from ciphie.n_grams import Frequencies
+from ciphie.Renderer import Renderer
 from ciphie.strings import BAR, INDENT
-from ciphie.utils import list_to_str
 
 help_text = f"""
 {colors.BOLD}[letter][replacement]{colors.ENDC}: replace [letter] with [replacement] and print the partially decoded ciphertext
@@ -20,67 +20,132 @@ help_text = f"""
 {colors.BOLD}?(.)[letter]{colors.ENDC}: highlight [letter] in the ciphertext with yellow only in the next print.
 {colors.BOLD}[letter][replacement]{colors.ENDC}: replace [letter] in the ciphertext with [replacement] and print the partially decoded ciphertext
 {colors.BOLD}.[letter][replacement]{colors.ENDC}: replace [letter] in the decoded ciphertext with [replacement] and print the partially decoded ciphertext
+{colors.BOLD}next{colors.ENDC}, {colors.BOLD}prev{colors.ENDC}, {colors.BOLD}page [number]{colors.ENDC}: move between pages of the ciphertext when paging is on
+{colors.BOLD}suggest{colors.ENDC}: print the best key the background solver has found so far, keeping the letters you set
+{colors.BOLD}accept{colors.ENDC}: replace the letters you have not set with the background solver's suggestion
+{colors.BOLD}unpin [letter...]{colors.ENDC}: let the background solver change [letter] again, or every letter if none are given
 {colors.BOLD}q{colors.ENDC}: quit
 """
 
 class Repl:
-    def __init__(self, ciphie: Ciphie, translation: Optional[Dict[int, int]] = None):
+    def __init__(self, ciphie: Ciphie, translation: Optional[Dict[int, int]] = None, page_size: Optional[int] = None,
+                 background: bool = False, seed: int = 0):
         self.ciphertext = ciphie.ciphertext
-        self.frequencies = Frequencies(ciphie.alphabetic_ciphertext)
+        self.frequencies = ciphie.frequencies
         self.key = Key(translation)
         self.highlighter = Highlighter()
+        self.renderer = Renderer(self.ciphertext, self.key, self.highlighter)
+        self.page_size = page_size
+        self.page = 0
+        # cipher letters the user set, which the background solver must leave alone
+        self.pinned = set()
+        self.solver = BackgroundSolver(ciphie, seed) if background else None
+
+    def get_page_footer(self):
+        if not self.page_size:
+            return ''
+        return f'{os.linesep}page {self.page + 1}/{self.renderer.get_page_count(self.page_size)}'
 
     def print_ciphertext(self):
-        buffer = [f"{BAR}{os.linesep}"]
-        for ch in self.ciphertext:
-            buffer.append(self.highlighter(ch, self.key.translate(ch)))
-        buffer.append(f"{os.linesep}{BAR}")
-        print(list_to_str(buffer))
+        rows = self.renderer.get_page(self.page, self.page_size)
+        print(f'{BAR}{os.linesep}{self.renderer.render(rows)}{os.linesep}{BAR}{self.get_page_footer()}')
 
     def print_overlay(self):
-        buffer = [BAR]
-        for line in self.ciphertext.splitlines():
-            buffer.append(f'{colors.UNDERLINE}{line}{colors.ENDC}')
-            line_buffer = []
-            for ch in line:
-                line_buffer.append(self.highlighter(ch, self.key.translate(ch)))
-            buffer.append(list_to_str(line_buffer))
-        buffer.append(BAR)
-        print(os.linesep.join(buffer))
+        rows = self.renderer.get_page(self.page, self.page_size)
+        print(f'{BAR}{os.linesep}{self.renderer.render_overlay(rows)}{os.linesep}{BAR}{self.get_page_footer()}')
+
+    def turn_page(self, page):
+        if not self.page_size:
+            print('paging is off, start with --page-size to turn it on')
+            return
+        self.page = min(max(page, 0), self.renderer.get_page_count(self.page_size) - 1)
+        self.print_ciphertext()
+
+    def highlight(self, ch, color):
+        self.highlighter.highlight(ch, color)
+        self.renderer.invalidate(ch)
+
+    def unhighlight(self, ch):
+        self.highlighter.unhighlight(ch)
+        self.renderer.invalidate(ch)
+
+    def update_solver(self):
+        if self.solver:
+            self.solver.update(self.key.values, self.pinned)
+
+    def print_suggestion(self):
+        if not self.solver:
+            print('the background solver is off, start with --background to turn it on')
+            return
+        suggestion = self.solver.get_suggestion()
+        if suggestion is None:
+            print('no suggestion yet, the background solver is still searching')
+            return
+        values = [chr(suggestion.translation[ord(ch)]) for ch in Key.alphabet]
+        changes = ''.join('^' if value != current else ' ' for value, current in zip(values, self.key.values))
+        status = 'still searching' if self.solver.searching else 'done'
+        print(f'score: {suggestion.score} ({status})')
+        print(os.linesep.join((Key.alphabet, ''.join(values), changes)))
+
+    def accept_suggestion(self):
+        suggestion = self.solver.get_suggestion() if self.solver else None
+        if suggestion is None:
+            print('no suggestion to accept')
+            return
+        for ch in Key.alphabet:
+            if ch not in self.pinned:
+                self.key.update(ch, chr(suggestion.translation[ord(ch)]))
+                self.renderer.invalidate(ch)
+        self.update_solver()
+        self.print_ciphertext()
+
+    def unpin(self, letters):
+        self.pinned.difference_update(letters.lower() if letters else Key.alphabet)
+        self.update_solver()
 
     def run(self):
         self.print_ciphertext()
         print('Type help to see the menu of commands:')
 
-        while True:
-            try:
-                prompt = input('> ')
-                if not self.process_input(prompt):
+        if self.solver:
+            self.solver.start()
+            self.update_solver()
+
+        try:
+            while True:
+                try:
+                    prompt = input('> ')
+                    if not self.process_input(prompt):
+                        break
+                except (KeyboardInterrupt, EOFError):
                     break
-            except (KeyboardInterrupt, EOFError):
-                break
-            except Exception:
-                print('an unexpected error occurred parsing your input')
-                print(BAR)
-                traceback.print_exc()
-                print(BAR)
+                except Exception:
+                    print('an unexpected error occurred parsing your input')
+                    print(BAR)
+                    traceback.print_exc()
+                    print(BAR)
+        finally:
+            if self.solver:
+                self.solver.stop()
 
     def update_key(self, key, val):
         for translation in self.key.get_translations(val):
-            self.highlighter.highlight(translation, colors.FAIL)
+            self.highlight(translation, colors.FAIL)
 
-        self.highlighter.highlight(key.upper(), colors.OK_CYAN)
+        self.highlight(key.upper(), colors.OK_CYAN)
         self.key.update(key, val)
+        self.pinned.add(key.lower())
+        self.update_solver()
         self.print_ciphertext()
 
     def print_ciphertext_with_highlight(self, char):
         original_color = self.highlighter.get(char)
-        self.highlighter.highlight(char, colors.WARNING)
+        self.highlight(char, colors.WARNING)
         self.print_ciphertext()
         if original_color:
-            self.highlighter.highlight(char, original_color)
+            self.highlight(char, original_color)
         else:
-            self.highlighter.unhighlight(char)
+            self.unhighlight(char)
 
     def highlight_values(self, modifier, values):
         for ch in values:
@@ -94,9 +159,9 @@ class Repl:
     def highlight_keys(self, modifier, keys):
         for ch in keys:
             if modifier == '+':
-                self.highlighter.highlight(ch, colors.OK_CYAN)
+                self.highlight(ch, colors.OK_CYAN)
             else:
-                self.highlighter.unhighlight(ch)
+                self.unhighlight(ch)
 
     def process_highlight(self, prompt):
         if prompt[1] == '.':
@@ -129,6 +194,18 @@ class Repl:
             self.frequencies.display()
         elif prompt == 'help':
             print(help_text)
+        elif prompt == 'suggest':
+            self.print_suggestion()
+        elif prompt == 'accept':
+            self.accept_suggestion()
+        elif prompt == 'unpin' or prompt.startswith('unpin '):
+            self.unpin(prompt[6:].replace(' ', ''))
+        elif prompt == 'next':
+            self.turn_page(self.page + 1)
+        elif prompt == 'prev':
+            self.turn_page(self.page - 1)
+        elif prompt.startswith('page ') and prompt[5:].strip().isdigit():
+            self.turn_page(int(prompt[5:]) - 1)
         elif prompt.startswith('?'):
             self.print_ciphertext_with_highlight(prompt[1])
         elif prompt.startswith('+') or prompt.startswith('-'):
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on Windows, where concurrent saves can drop each other's entries
+    fcntl = None
+
+from ciphie.n_gram_cache import write_atomic
+
+# bump whenever the layout of the file changes so old results are ignored
+RESULT_CACHE_VERSION = 2
+
+# results are per user, so they go in the user's cache folder rather than next to the package
+cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+DEFAULT_PATH = os.path.join(cache_home, 'ciphie', f'results.v{RESULT_CACHE_VERSION}.json')
+
+
+def get_digest(ciphertext: str) -> str:
+    return hashlib.sha256(ciphertext.encode('ascii')).hexdigest()
+
+
+# Keys of ciphertexts solved before, kept on disk between runs. Results are looked
+# up by a hash of the alphabetic ciphertext and evicted least recently used first;
+# each holds the key, its score and the options of the search that found it, so a
+# run with other options can tell the key apart from one it would find itself. The
+# most recently found keys are also kept apart, since the same key is often reused
+# for other messages and makes a far better starting point than letter
+# frequencies. Keys are the plaintext letters of the cipher letters a to z.
+class ResultCache:
+    def __init__(self, path: str = DEFAULT_PATH, max_entries: int = 1000, max_keys: int = 16):
+        self.path = path
+        self.max_entries = max(max_entries, 1)
+        self.max_keys = max_keys
+        self.results = OrderedDict()
+        self.keys = []
+        # lifetime totals as read from disk, then this run's lookups on top
+        self.total_hits = 0
+        self.total_misses = 0
+        self.hits = 0
+        self.misses = 0
+        self.warm_starts = 0
+        self.evictions = 0
+        # this run's lookups already added to the totals on disk
+        self.saved_hits = 0
+        self.saved_misses = 0
+        self.changed = False
+        self._load()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data if data.get('version') == RESULT_CACHE_VERSION else None
+
+    def _load(self):
+        data = self._read()
+        if data is None:
+            return
+        self.results = OrderedDict(data['results'])
+        self.keys = data['keys']
+        self.total_hits = data['hits']
+        self.total_misses = data['misses']
+
+    def get(self, ciphertext: str) -> Optional[dict]:
+        # the {key, score, options} result stored for the ciphertext, if any
+        digest = get_digest(ciphertext)
+        result = self.results.get(digest)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.results.move_to_end(digest)
+        self.changed = True
+        return result
+
+    def put(self, ciphertext: str, key: str, score: float, options: dict):
+        digest = get_digest(ciphertext)
+        self.results[digest] = {'key': key, 'score': score, 'options': options}
+        self.results.move_to_end(digest)
+        self._evict()
+        if key in self.keys:
+            self.keys.remove(key)
+        self.keys.insert(0, key)
+        del self.keys[self.max_keys:]
+        self.changed = True
+
+    def _evict(self):
+        while len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    @contextmanager
+    def _lock(self):
+        # held from reading the file to replacing it, so concurrent saves don't drop each other's entries
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.lock', 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def save(self):
+        if not self.changed:
+            return
+        try:
+            with self._lock():
+                self._save()
+        except OSError:
+            return
+        self.changed = False
+
+    def _save(self):
+        # other processes may have saved since this one loaded, so merge into what is on disk
+        data = self._read()
+        results = OrderedDict(data['results']) if data else OrderedDict()
+        for digest, result in self.results.items():
+            results.pop(digest, None)
+            results[digest] = result
+        self.results = results
+        self._evict()
+        self.keys = list(OrderedDict.fromkeys(self.keys + (data['keys'] if data else [])))[:self.max_keys]
+        hits = (data['hits'] if data else 0) + self.hits - self.saved_hits
+        misses = (data['misses'] if data else 0) + self.misses - self.saved_misses
+
+        data = {'version': RESULT_CACHE_VERSION, 'results': list(self.results.items()), 'keys': self.keys, 'hits': hits, 'misses': misses}
+        write_atomic(self.path, json.dumps(data).encode('ascii'))
+        self.saved_hits, self.saved_misses = self.hits, self.misses
+        self.total_hits, self.total_misses = hits - self.hits, misses - self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.total_hits + self.hits
+        lookups = hits + self.total_misses + self.misses
+        return hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return (
+            f'result cache: {self.hits} hits, {self.misses} misses, {self.warm_starts} warm starts, '
+            f'{round(self.hit_rate * 100, 1)}% hit rate over all runs, '
+            f'{len(self.results)}/{self.max_entries} entries, {len(self.keys)} recent keys, {self.evictions} evictions'
+        )
@@ -0,0 +1,46 @@
+import sys
+from collections import OrderedDict
+from typing import Optional
+
+# rough cost of one entry: the 26 byte key, the float score and the ordered dict's own link and slot
+ENTRY_SIZE = sys.getsizeof(bytes(26)) + sys.getsizeof(0.0) + 100
+
+
+# Bounded least-recently-used map from keys to their scores, for one ciphertext.
+# Keys are the 26 plaintext indices of the cipher letters packed into bytes.
+class ScoreCache:
+    def __init__(self, max_bytes: int = 16 * 2 ** 20):
+        self.max_entries = max(max_bytes // ENTRY_SIZE, 1)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[float]:
+        score = self.entries.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return score
+
+    def put(self, key: bytes, score: float):
+        self.entries[key] = score
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return (
+            f'score cache: {self.hits} hits, {self.misses} misses ({round(self.hit_rate * 100, 1)}% hit rate), '
+            f'{len(self.entries)}/{self.max_entries} entries, {self.evictions} evictions'
+        )
@@ -0,0 +1,74 @@
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from ciphie.strings import BAR
+
+
+# Phase timings, counters and a score-over-time trace of one decode. Timestamps
+# are perf_counter values, which share a clock across forked workers, so the
+# stats of restarts run elsewhere can be merged back in.
+class Stats:
+    def __init__(self, start: Optional[float] = None):
+        self.start = time.perf_counter() if start is None else start
+        self.phases: Dict[str, float] = {}
+        self.calls = Counter()
+        self.counters = Counter()
+        self.trace = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def record_score(self, score: float, source: Optional[str] = None):
+        self.trace.append((time.perf_counter(), score, source))
+
+    def merge(self, other: 'Stats'):
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.calls.update(other.calls)
+        self.counters.update(other.counters)
+        self.trace.extend(other.trace)
+        self.trace.sort(key=lambda point: point[0])
+
+    def to_dict(self):
+        return {
+            'phases': {name: {'seconds': seconds, 'calls': self.calls[name]} for name, seconds in self.phases.items()},
+            'counters': dict(self.counters),
+            # seconds since the decode started
+            'trace': [
+                {'time': round(timestamp - self.start, 6), 'score': score, 'source': source}
+                for timestamp, score, source in self.trace
+            ],
+        }
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def __str__(self):
+        buffer = [BAR, 'phases:']
+        for name, seconds in sorted(self.phases.items(), key=lambda item: -item[1]):
+            buffer.append(f'  {name:<20} {seconds:>9.4f}s  {self.calls[name]:>7} calls')
+        buffer.append('counters:')
+        for name, count in sorted(self.counters.items()):
+            buffer.append(f'  {name:<20} {count:>10}')
+        if self.trace:
+            best = max(self.trace, key=lambda point: point[1])
+            buffer.append(f'best score {best[1]:.6f} after {best[0] - self.start:.4f}s, {len(self.trace)} improvements traced')
+        buffer.append(BAR)
+        return os.linesep.join(buffer)
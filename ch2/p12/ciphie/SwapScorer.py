@@ -0,0 +1,116 @@
+import string
+from typing import List, Optional, Tuple
+
+from ciphie.n_grams import NGrams
+from ciphie.ScoreCache import ScoreCache
+
+
+# Scores keys for a fixed ciphertext without re-translating it. The distinct
+# ciphertext n-grams are collected once in cipher-letter space; since a key is a
+# permutation each of them maps to a distinct plaintext gram, so the score is the
+# weighted sum of the table values of the translated grams. Swapping two key
+# letters only changes the grams containing one of the two cipher letters.
+# Scores of keys already evaluated can be looked up in a ScoreCache instead.
+class SwapScorer:
+    def __init__(self, n_grams: NGrams, ciphertext: str, cache: Optional[ScoreCache] = None):
+        self.sizes = n_grams.sizes
+        self.tables = {n: n_grams[n].table for n in self.sizes}
+        self.grams = {}
+        self.counts = {}
+        for n in self.sizes:
+            cipher_grams = n_grams.get_cipher_grams(ciphertext, n)
+            self.grams[n] = [self._get_letters(code, n) for code in cipher_grams]
+            self.counts[n] = list(cipher_grams.values())
+        self.index = {n: self._index_grams(self.grams[n]) for n in self.sizes}
+        self.weights = {n: 1 / len(self.sizes) for n in self.sizes}
+        self.cipher_alphabet = string.ascii_lowercase
+        self.key = list(range(26))
+        self.values = {}
+        self.score = 0.0
+        self.cache = cache
+        self.swaps = 0
+
+    @staticmethod
+    def _get_letters(code: int, n: int) -> Tuple[int, ...]:
+        letters = []
+        for _ in range(n):
+            code, letter = divmod(code, 26)
+            letters.append(letter)
+        return tuple(reversed(letters))
+
+    @staticmethod
+    def _index_grams(grams: List[Tuple[int, ...]]) -> List[List[int]]:
+        index = [[] for _ in range(26)]
+        for gram_id, gram in enumerate(grams):
+            for letter in set(gram):
+                index[letter].append(gram_id)
+        return index
+
+    def _value(self, n: int, gram_id: int) -> float:
+        code = 0
+        for letter in self.grams[n][gram_id]:
+            code = code * 26 + self.key[letter]
+        return self.counts[n][gram_id] * self.tables[n][code]
+
+    def _affected(self, n: int, a: int, b: int):
+        index = self.index[n]
+        if not index[b]:
+            return index[a]
+        if not index[a]:
+            return index[b]
+        return set(index[a]).union(index[b])
+
+    def set_key(self, cipher_alphabet: str, key: str):
+        self.cipher_alphabet = cipher_alphabet
+        for cipher_ch, plain_ch in zip(cipher_alphabet, key):
+            self.key[ord(cipher_ch) - ord('a')] = ord(plain_ch) - ord('a')
+
+        self.score = 0.0
+        for n, grams in self.grams.items():
+            self.values[n] = [self._value(n, gram_id) for gram_id in range(len(grams))]
+            self.score += self.weights[n] * sum(self.values[n])
+        return self.score
+
+    def get_key(self) -> str:
+        return ''.join(
+            chr(self.key[ord(ch) - ord('a')] + ord('a')) for ch in self.cipher_alphabet
+        )
+
+    def _swap_key(self, i: int, j: int) -> Tuple[int, int]:
+        a = ord(self.cipher_alphabet[i]) - ord('a')
+        b = ord(self.cipher_alphabet[j]) - ord('a')
+        self.key[a], self.key[b] = self.key[b], self.key[a]
+        return a, b
+
+    def swap_delta(self, i: int, j: int) -> float:
+        a, b = self._swap_key(i, j)
+        if self.cache is not None:
+            cache_key = bytes(self.key)
+            score = self.cache.get(cache_key)
+            if score is not None:
+                self._swap_key(i, j)
+                return score - self.score
+
+        delta = 0.0
+        for n in self.sizes:
+            values = self.values[n]
+            n_delta = 0.0
+            for gram_id in self._affected(n, a, b):
+                n_delta += self._value(n, gram_id) - values[gram_id]
+            delta += self.weights[n] * n_delta
+        if self.cache is not None:
+            self.cache.put(cache_key, self.score + delta)
+        self._swap_key(i, j)
+        return delta
+
+    def swap(self, i: int, j: int) -> float:
+        a, b = self._swap_key(i, j)
+        self.swaps += 1
+        self.score = 0.0
+        for n in self.sizes:
+            values = self.values[n]
+            for gram_id in self._affected(n, a, b):
+                values[gram_id] = self._value(n, gram_id)
+            # re-summing keeps the running score from drifting over many swaps
+            self.score += self.weights[n] * sum(values)
+        return self.score
@@ -0,0 +1,132 @@
+import mmap
+import os
+import struct
+from array import array
+from collections import deque
+
+from ciphie.n_gram_cache import CACHE_VERSION, get_cache_path, is_fresh, write_atomic
+from ciphie.n_grams import NGramFile, data_folder
+
+MAGIC = b'CPHW'
+
+# magic, version, number of words, number of states; followed by the transition
+# table as uint32 (26 per state) and the longest word ending in each state as uint8
+HEADER = struct.Struct('<4sHII')
+
+
+# Aho-Corasick automaton over the most common dictionary words, with the failure
+# links folded into a dense transition table so matching is one lookup per letter.
+class WordAutomaton:
+    filename = os.path.join(data_folder, 'english_words.txt.zip')
+    _default = None
+
+    def __init__(self, max_words=20000, min_length=3, use_cache=True):
+        self.max_words = max_words
+        self.min_length = min_length
+        self.transitions, self.lengths = self._load(use_cache)
+
+    @classmethod
+    def load(cls):
+        # shared automaton over the default word list, built or read on first use
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def get_cache_path(self):
+        return get_cache_path(self.filename, f'.{self.max_words}.{self.min_length}.ac')
+
+    def _load(self, use_cache):
+        path = self.get_cache_path()
+        if use_cache and is_fresh(self.filename, path):
+            cached = self._read(path)
+            if cached:
+                return cached
+
+        transitions, lengths = self.build(self.get_words())
+        if use_cache:
+            try:
+                self._write(path, transitions, lengths)
+            except OSError:
+                pass
+        return transitions, lengths
+
+    def get_words(self):
+        words = []
+        with NGramFile(self.filename) as f:
+            for line in f:
+                if len(words) >= self.max_words:
+                    break
+                word = line.split(b' ')[0].strip().decode('ascii').lower()
+                if len(word) >= self.min_length and word.isalpha():
+                    words.append(word)
+        return words
+
+    @staticmethod
+    def build(words):
+        children = [{}]
+        lengths = [0]
+        for word in words:
+            state = 0
+            for ch in word:
+                letter = ord(ch) - ord('a')
+                if letter not in children[state]:
+                    children[state][letter] = len(children)
+                    children.append({})
+                    lengths.append(0)
+                state = children[state][letter]
+            lengths[state] = len(word)
+
+        transitions = array('I', bytes(4 * 26 * len(children)))
+        failures = [0] * len(children)
+        queue = deque()
+        for letter in range(26):
+            child = children[0].get(letter)
+            if child is not None:
+                transitions[letter] = child
+                queue.append(child)
+
+        # breadth first, so the failure state of every state is finished before it is needed
+        while queue:
+            state = queue.popleft()
+            fallback = failures[state]
+            lengths[state] = max(lengths[state], lengths[fallback])
+            for letter in range(26):
+                child = children[state].get(letter)
+                if child is None:
+                    transitions[state * 26 + letter] = transitions[fallback * 26 + letter]
+                else:
+                    failures[child] = transitions[fallback * 26 + letter]
+                    transitions[state * 26 + letter] = child
+                    queue.append(child)
+
+        return transitions, array('B', (min(length, 255) for length in lengths))
+
+    def _read(self, path):
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, words, states = HEADER.unpack_from(mm)
+            if magic != MAGIC or version != CACHE_VERSION or words != self.max_words:
+                return None
+            offset = HEADER.size
+            transitions = array('I', mm[offset:offset + 4 * 26 * states])
+            offset += 4 * 26 * states
+            lengths = array('B', mm[offset:offset + states])
+        return transitions, lengths
+
+    def _write(self, path, transitions, lengths):
+        header = HEADER.pack(MAGIC, CACHE_VERSION, self.max_words, len(lengths))
+        write_atomic(path, header + transitions.tobytes() + lengths.tobytes())
+
+    def coverage(self, text: str) -> float:
+        # fraction of the letters of text that fall inside at least one dictionary word
+        transitions = self.transitions
+        lengths = self.lengths
+        state = 0
+        covered = 0
+        covered_until = -1
+        for i, letter in enumerate(text.encode('ascii')):
+            state = transitions[state * 26 + letter - ord('a')]
+            length = lengths[state]
+            if length:
+                covered += i - max(covered_until, i - length)
+                covered_until = i
+        return covered / len(text) if text else 0.0
@@ -1,18 +1,147 @@
+import signal
+import string
+import sys
 
-from ciphie.args import get_args
+from ciphie.args import get_args, get_ciphie, get_stream
+from ciphie.batch import get_options, run_batch
 from ciphie.Ciphie import Ciphie
+from ciphie.model import build_model
+from ciphie.n_grams import NGrams
 from ciphie.Repl import Repl
+from ciphie.ResultCache import get_digest
+from ciphie.serve import request, serve
+from ciphie.stream import read_stream
+from ciphie.WordAutomaton import WordAutomaton
+
+
+def build_cache(args):
+    n_grams_classes = [NGrams]
+    try:
+        from ciphie.log_n_grams import LogNGrams
+        n_grams_classes.append(LogNGrams)
+    except ImportError:
+        print('numpy is not installed, skipping the log-probability tables')
+
+    paths = set()
+    for n_grams_class in n_grams_classes:
+        paths.update(n_grams_class.build_cache())
+    paths.add(WordAutomaton.load().get_cache_path())
+    for path in sorted(paths):
+        print(path)
+
+
+def decode(args, ciphie):
+    if not args.cprofile:
+        return ciphie.decode(args.restarts, args.jobs, args.seed)
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    best_key = profiler.runcall(ciphie.decode, args.restarts, args.jobs, args.seed)
+    profiler.dump_stats(args.cprofile)
+    if args.profile:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    return best_key
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def forward(args, ciphertext):
+    # the key found by a running ciphie serve process, or None to decode here
+    if args.no_server or args.checkpoint or args.profile or args.profile_output or args.cprofile:
+        return None
+    # the service solves with this process's solver options, so the key is the one a local decode would find
+    result = request(args.socket, {'ciphertext': ciphertext, 'options': get_options(args)}, args.server_timeout)
+    if result is None or 'key' not in result:
+        return None
+    if args.verbose:
+        print(f'solved by the service on {args.socket} in {result["elapsed"]}s (score {result["score"]})')
+    return str.maketrans(string.ascii_lowercase, result['key'])
+
+
+def break_periodic(args, ciphertext):
+    from ciphie.vigenere import break_vigenere, format_result, format_statistics
+
+    n_grams = Ciphie.create_n_grams(args.fitness)
+    result = break_vigenere(ciphertext, n_grams, args.cipher, args.max_period, args.period, args.jobs)
+    if args.verbose:
+        print(format_statistics(result.statistics, result.period))
+    print(format_result(result))
+
+
+def break_columnar(args, ciphertext):
+    from ciphie.transposition import SCHEDULE, break_transposition, format_result, format_statistics
+
+    n_grams = Ciphie.create_n_grams(args.fitness)
+    schedule = tuple(default if value is None else value
+                     for value, default in zip((args.temperature, args.final_temperature, args.schedule), SCHEDULE))
+    try:
+        result = break_transposition(ciphertext, n_grams, args.strategy, args.max_width, args.width, args.widths,
+                                     args.max_iterations, args.seed, args.jobs, schedule)
+    except ValueError as e:
+        print(f'Error: {e}')
+        sys.exit(1)
+    if args.verbose:
+        print(format_statistics(result))
+    print(format_result(result))
+    return result.plaintext
+
+
+commands = {
+    'build-cache': build_cache,
+    'batch': run_batch,
+    'build-model': build_model,
+    'serve': serve,
+}
 
 
 def main():
     args, ciphertext = get_args()
+    if args.command:
+        return commands[args.command](args)
+
+    if args.cipher in ('vigenere', 'beaufort'):
+        return break_periodic(args, ciphertext)
 
     best_key = None
-    ciphie = Ciphie(ciphertext, args.verbose)
-    if args.decode:
-        best_key = ciphie.decode()
-    
-    Repl(ciphie, best_key).run()
+    if args.cipher == 'transposition':
+        # the REPL opens on the columns put back in order, under a key that leaves every letter
+        # alone, so the text can still be worked on if it was also substituted
+        ciphertext = break_columnar(args, ciphertext)
+        best_key = str.maketrans(string.ascii_lowercase, string.ascii_lowercase)
+
+    frequencies = None
+    if args.stream:
+        with get_stream(args) as f:
+            ciphertext, frequencies = read_stream(f, args.sample_size, args.chunk_size, args.seed)
+
+    ciphie = get_ciphie(args, ciphertext, frequencies)
+    if best_key is None and args.decode and not args.stream:
+        best_key = forward(args, ciphertext)
+    if best_key is None and (args.decode or args.profile):
+        checkpoint = ciphie.checkpoint
+        if checkpoint is not None and checkpoint.state is not None:
+            if not checkpoint.matches(get_digest(ciphie.alphabetic_ciphertext), args.fitness, args.strategy):
+                print('Error: the checkpoint is for another ciphertext, fitness or strategy')
+                sys.exit(1)
+        try:
+            if checkpoint is not None:
+                # a preempted job gets SIGTERM, and saves its search the same way as on Ctrl-C
+                signal.signal(signal.SIGTERM, interrupt)
+            best_key = decode(args, ciphie)
+        except KeyboardInterrupt:
+            if checkpoint is None:
+                raise
+            print(f'Interrupted, the search is saved in {checkpoint.path}; continue it with --resume')
+            sys.exit(130)
+        if args.profile:
+            print(ciphie.stats)
+        if args.profile_output:
+            ciphie.stats.write(args.profile_output)
+
+    Repl(ciphie, best_key, args.page_size, args.background, args.seed).run()
 
 
 main()
\ No newline at end of file
@@ -1,7 +1,26 @@
 import os
 import sys
+import tempfile
 from argparse import ArgumentParser
 
+from ciphie.Checkpoint import Checkpoint
+from ciphie.Ciphie import Ciphie
+from ciphie.model import FORMATS
+from ciphie.ResultCache import ResultCache
+from ciphie.stream import CHUNK_SIZE
+from ciphie.strategies import STRATEGIES, HillClimb, SimulatedAnnealing, create_strategy
+
+# a folder of the user's own, so no other user can take the socket's name and receive the ciphertexts sent to it
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f'ciphie-{os.getuid()}' if hasattr(os, 'getuid') else 'ciphie'),
+    'ciphie.sock',
+)
+
+
+def get_stream(args):
+    if args.input:
+        return open(args.input, 'rb')
+    return sys.stdin.buffer
 
 def get_ciphertext(args):
     if args.input:
@@ -17,11 +36,102 @@ def create_arg_parser():
     arg_parser.add_argument('-i', '--input', help='File input (default: stdin)')
     arg_parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
     arg_parser.add_argument('-d', '--decode', action='store_true', help='Attempt to break ciphertext before entering REPL')
+    arg_parser.add_argument('--profile', action='store_true', help='Print the time spent in each phase of the decode and its counters (implies -d)')
+    arg_parser.add_argument('--profile-output', help='Write the phase timings, counters and score trace of the decode to a JSON file')
+    arg_parser.add_argument('--cprofile', help='Run the decode under cProfile and dump the pstats to a file')
+    arg_parser.add_argument('--checkpoint', help='Save the state of the key search to this file as it runs, and when it is interrupted')
+    arg_parser.add_argument('--checkpoint-interval', type=float, default=30, help='Seconds between checkpoints (default: 30)')
+    arg_parser.add_argument('--resume', action='store_true', help='Continue the search saved in --checkpoint, if there is one')
+    arg_parser.add_argument('--background', action='store_true', help='Keep searching for a better key in the background while in the REPL, leaving the letters you set alone')
+    arg_parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f'Unix socket of the ciphie serve process that -d forwards the decode to when it is running (default: {DEFAULT_SOCKET})')
+    arg_parser.add_argument('--server-timeout', type=float, default=60, help='Seconds to wait for the ciphie serve process to answer before decoding in this process instead (default: 60)')
+    arg_parser.add_argument('--no-server', action='store_true', help='Always decode in this process, even when a ciphie serve process is running')
+    arg_parser.add_argument('--page-size', type=int, help='Rows of ciphertext printed at a time in the REPL (default: all)')
+    arg_parser.add_argument('--stream', action='store_true', help='Read the input in chunks, counting n-grams over all of it but keeping only a sample of the letters')
+    arg_parser.add_argument('--sample-size', type=int, default=20000, help='Letters kept from a streamed input (default: 20000)')
+    arg_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'Bytes read at a time from a streamed input (default: {CHUNK_SIZE})')
+    arg_parser.add_argument('-r', '--restarts', type=int, default=1, help='Number of randomly perturbed hill-climbs to run when decoding (default: 1)')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='Worker processes used for restarts, batch, serve and vigenere columns (default: number of CPUs)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='Seed for restart perturbations and randomized search strategies (default: 0)')
+    arg_parser.add_argument('-c', '--cipher', choices=('substitution', 'vigenere', 'beaufort', 'transposition'), default='substitution', help='Cipher to break; vigenere and beaufort print the key and plaintext instead of entering the REPL, transposition prints them and opens the REPL on the plaintext, and all three require numpy (default: substitution)')
+    arg_parser.add_argument('--max-period', type=int, default=20, help='vigenere, beaufort: longest key period tried (default: 20)')
+    arg_parser.add_argument('--period', type=int, help='vigenere, beaufort: key period, instead of detecting it')
+    arg_parser.add_argument('--max-width', type=int, default=20, help='transposition: most columns tried (default: 20)')
+    arg_parser.add_argument('--width', type=int, help='transposition: number of columns, instead of detecting it')
+    arg_parser.add_argument('--widths', type=int, default=4, help='transposition: widths with the best digram statistic that are searched, in parallel (default: 4)')
+    arg_parser.add_argument('-s', '--strategy', choices=tuple(STRATEGIES), default=HillClimb.name, help='Key search strategy (default: hill-climb)')
+    arg_parser.add_argument('--max-iterations', type=int, help='Stop the search after evaluating this many keys')
+    arg_parser.add_argument('--time-limit', type=float, help='Stop the search after this many seconds')
+    arg_parser.add_argument('--temperature', type=float, help='annealing: starting temperature, relative to the average score change of a swap (default: 0.2)')
+    arg_parser.add_argument('--final-temperature', type=float, help='annealing: final temperature (default: 0.01)')
+    arg_parser.add_argument('--schedule', choices=SimulatedAnnealing.schedules, help='annealing: temperature schedule (default: geometric)')
+    arg_parser.add_argument('--tenure', type=int, help='tabu: number of moves a swapped letter pair stays tabu (default: 8)')
+    arg_parser.add_argument('--candidates', type=int, help='tabu: swaps sampled per move (default: 100)')
+    arg_parser.add_argument('--patience', type=int, help='tabu: moves without a new best before stopping (default: 30)')
+    arg_parser.add_argument('-w', '--words', action='store_true', help='Finish the search by also scoring dictionary word coverage')
+    arg_parser.add_argument('--patterns', action='store_true', help='Solve the letters that the dictionary words fitting the letter patterns of the ciphertext\'s words agree on first, and only search the rest; needs word breaks')
+    arg_parser.add_argument('--result-cache', type=int, default=0, help='Keep the keys of up to this many solved ciphertexts in the user cache folder, to reuse them and the most recent keys as starting points (default: 0, off)')
+    arg_parser.add_argument('--score-cache', type=float, default=16, help='Memory for remembering the scores of keys already tried, in MB; 0 turns it off (default: 16)')
+    arg_parser.add_argument('--word-weight', type=float, default=0.2, help='Share of the n-gram score that full word coverage is worth (default: 0.2)')
+    arg_parser.add_argument('-f', '--fitness', choices=('frequency', 'log'), default='frequency', help='N-gram fitness used to score keys (log requires numpy)')
+
+    subparsers = arg_parser.add_subparsers(dest='command', title='commands', metavar='command')
+    subparsers.add_parser('build-cache', help='Compile the n-gram files in ciphie/data into the binary cache')
+
+    model_parser = subparsers.add_parser('build-model', help='Count the n-grams of a text corpus into tables like the ones in ciphie/data')
+    model_parser.add_argument('corpus', nargs='+', help='Text files to count, split between --jobs worker processes, or - for stdin')
+    model_parser.add_argument('-n', '--orders', type=int, nargs='+', default=[1, 2, 3, 4, 5], help='Gram lengths to count (default: 1 2 3 4 5)')
+    model_parser.add_argument('-o', '--output', default='.', help='Folder the tables are written to (default: .)')
+    model_parser.add_argument('--name', default='english', help='Table file name prefix, as in english_trigrams.txt.zip (default: english)')
+    model_parser.add_argument('--format', choices=FORMATS, default='zip', help='"GRAM count" lines as .txt or .txt.zip, or the binary cache layout (default: zip)')
+    model_parser.add_argument('--min-count', type=int, default=1, help='Leave out grams counted fewer times (default: 1)')
+
+    serve_parser = subparsers.add_parser('serve', help='Keep the n-gram tables loaded and solve requests from other processes on a worker pool')
+    serve_parser.add_argument('--port', type=int, help='Serve HTTP on 127.0.0.1 at this port (POST /solve, GET /metrics) instead of JSON lines on --socket')
+
+    batch_parser = subparsers.add_parser('batch', help='Solve many ciphertexts in parallel and stream the results as JSONL')
+    batch_parser.add_argument('inputs', nargs='+', help='Directories of ciphertext files, JSONL files of {"id", "ciphertext"} objects, or - for JSONL on stdin')
+    batch_parser.add_argument('-p', '--pattern', default='*.txt', help='Glob matched inside input directories (default: *.txt)')
+    batch_parser.add_argument('-o', '--output', help='File output (default: stdout)')
 
     return arg_parser
 
+def get_strategy(args):
+    return create_strategy(args.strategy, **vars(args))
+
+def get_ciphie(args, ciphertext, frequencies=None):
+    result_cache = ResultCache(max_entries=args.result_cache) if args.result_cache else None
+    checkpoint = Checkpoint(args.checkpoint, args.checkpoint_interval, args.resume) if args.checkpoint else None
+    return Ciphie(ciphertext, args.verbose, args.fitness, get_strategy(args), args.words, args.word_weight, frequencies,
+                  int(args.score_cache * 2 ** 20), args.patterns, result_cache, checkpoint)
+
 def get_args():
-    args = create_arg_parser().parse_args()
+    arg_parser = create_arg_parser()
+    args = arg_parser.parse_args()
+    if args.checkpoint and (args.command or args.restarts > 1):
+        arg_parser.error('--checkpoint saves a single search, so it cannot be used with commands or --restarts')
+    if args.resume and not args.checkpoint:
+        arg_parser.error('--resume needs --checkpoint')
+    if (args.temperature is not None and args.temperature <= 0) or (args.final_temperature is not None and args.final_temperature <= 0):
+        arg_parser.error('annealing temperatures must be greater than 0')
+    if args.stream and args.cipher != 'substitution':
+        arg_parser.error('--stream only works with substitution ciphers')
+    if args.cipher == 'transposition':
+        if args.strategy not in ('hill-climb', 'annealing'):
+            arg_parser.error('transposition keys are searched with hill-climb or annealing')
+        if args.checkpoint or args.time_limit is not None or args.result_cache:
+            arg_parser.error('--checkpoint, --time-limit and --result-cache only work with substitution ciphers')
+        if args.width is not None and args.width < 2:
+            arg_parser.error('--width must be at least 2')
+    if args.command:
+        return args, None
+
+    if args.stream:
+        if args.input and not os.path.exists(args.input):
+            print('Error: file does not exist')
+            sys.exit(1)
+        # read by the caller, so the input is never held in memory at once
+        return args, None
 
     ciphertext = get_ciphertext(args)
     if ciphertext is None:
@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import sys
+import time
+from argparse import Namespace
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+
+from ciphie.args import get_ciphie
+from ciphie.WordAutomaton import WordAutomaton
+from ciphie.utils import get_mp_context, translation_to_key
+
+# jobs queued per worker, so inputs are read only a little ahead of the solvers
+QUEUED_PER_WORKER = 2
+
+# arguments that change the key a solve finds, which a request to the service carries along
+SOLVER_OPTIONS = (
+    'fitness', 'strategy', 'max_iterations', 'time_limit', 'temperature', 'final_temperature', 'schedule', 'tenure',
+    'candidates', 'patience', 'words', 'word_weight', 'patterns', 'result_cache', 'restarts', 'seed',
+)
+
+_worker_args = None
+
+
+def read_jsonl(f, source):
+    # yields (id, ciphertext, error) for every line, so a bad line fails only its own job
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        job_id = f'{source}:{line_number}'
+        try:
+            job = json.loads(line)
+        except ValueError:
+            yield job_id, None, 'invalid JSON'
+            continue
+        if not isinstance(job, dict):
+            yield job_id, None, 'expected {"id": ..., "ciphertext": "..."}'
+            continue
+        job_id = str(job.get('id', job_id))
+        if not isinstance(job.get('ciphertext'), str):
+            yield job_id, None, 'expected {"id": ..., "ciphertext": "..."}'
+            continue
+        yield job_id, job['ciphertext'], None
+
+
+def read_file(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read(), None
+    except (OSError, UnicodeDecodeError) as e:
+        return None, str(e)
+
+
+def read_jobs(inputs, pattern):
+    for path in inputs:
+        if path == '-':
+            yield from read_jsonl(sys.stdin, 'stdin')
+        elif os.path.isdir(path):
+            for filename in sorted(glob.glob(os.path.join(path, '**', pattern), recursive=True)):
+                yield (filename, *read_file(filename))
+        else:
+            try:
+                with open(path, 'r') as f:
+                    yield from read_jsonl(f, path)
+            except (OSError, UnicodeDecodeError) as e:
+                yield path, None, str(e)
+
+
+def _init_worker(args):
+    global _worker_args
+    _worker_args = args
+
+
+def get_options(args) -> dict:
+    return {name: getattr(args, name) for name in SOLVER_OPTIONS}
+
+
+def solve(job_id, ciphertext, options=None):
+    # options, as from get_options, override the ones the worker was started with
+    start = time.time()
+    args = _worker_args if options is None else Namespace(**{**vars(_worker_args), **options})
+    ciphie = get_ciphie(args, ciphertext)
+    ciphie.verbose = False
+    # a worker is a single process, so restarts run one after another
+    ciphie.decode(args.restarts, 1, args.seed)
+    return {
+        'id': job_id,
+        'key': translation_to_key(ciphie.best_key),
+        'score': ciphie.best_score,
+        'plaintext': ciphie.ciphertext.translate(ciphie.best_key),
+        'elapsed': round(time.time() - start, 4),
+    }
+
+
+def run_batch(args):
+    # load the shared tables before forking so every worker inherits them
+    get_ciphie(args, '').n_grams.load()
+    if args.words:
+        WordAutomaton.load()
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    jobs = read_jobs(args.inputs, args.pattern)
+    solved = 0
+    failed = 0
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.jobs,
+            mp_context=get_mp_context(),
+            initializer=_init_worker,
+            initargs=(args,),
+        ) as executor:
+
+            def submit(job):
+                job_id, ciphertext, error = job
+                if error is None:
+                    future = executor.submit(solve, job_id, ciphertext)
+                else:
+                    # jobs that could not be read are answered without a worker
+                    future = Future()
+                    future.set_exception(ValueError(error))
+                ids[future] = job_id
+                return future
+
+            ids = {}
+            pending = {submit(job) for job in islice(jobs, args.jobs * QUEUED_PER_WORKER)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = ids.pop(future)
+                    try:
+                        result = future.result()
+                        solved += 1
+                    except Exception as e:
+                        # one failed job is reported in its line and the rest of the batch carries on
+                        result = {'id': job_id, 'error': str(e) or type(e).__name__}
+                        failed += 1
+                    output.write(json.dumps(result) + os.linesep)
+                    output.flush()
+                pending.update(submit(job) for job in islice(jobs, len(done)))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if args.verbose:
+        print(f'solved {solved} ciphertexts, {failed} failed, in {round(time.time() - start, 2)}s', file=sys.stderr)
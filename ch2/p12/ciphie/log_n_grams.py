@@ -0,0 +1,108 @@
+import io
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from ciphie.n_gram_cache import get_cache_path, is_fresh, write_atomic
+from ciphie.n_grams import GramCounts, NGrams, code_to_gram, load_counts, parse_counts
+
+# relative count given to grams that never appear in the corpus
+FLOOR = 0.01
+
+
+def encode(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode('ascii'), dtype=np.uint8) - ord('a')
+
+
+def get_gram_codes(indices: np.ndarray, n: int) -> np.ndarray:
+    length = len(indices) - n + 1
+    if length <= 0:
+        return np.zeros(0, dtype=np.int64)
+    codes = indices[:length].astype(np.int64)
+    for offset in range(1, n):
+        codes = codes * 26 + indices[offset:offset + length]
+    return codes
+
+
+def get_log_probabilities(n, codes, counts) -> np.ndarray:
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    log_probabilities = np.full(26 ** n, math.log10(FLOOR / total))
+    log_probabilities[np.asarray(codes, dtype=np.int64)] = np.log10(counts / total)
+    return log_probabilities
+
+
+def write_log_probabilities(source, log_probabilities):
+    buffer = io.BytesIO()
+    np.save(buffer, log_probabilities)
+    path = get_cache_path(source, '.npy')
+    write_atomic(path, buffer.getvalue())
+    return path
+
+
+class LogNGram:
+    def __init__(self, filename, use_cache=True):
+        self.size, self.codes, self.counts = load_counts(filename, use_cache)
+        self.log_probabilities = self._load(filename, self.size, self.codes, self.counts, use_cache)
+        self._db = None
+        self._table = None
+
+    @property
+    def db(self):
+        # relative frequencies by gram, only needed for the monogram order
+        if self._db is None:
+            total = sum(self.counts)
+            self._db = OrderedDict(
+                (code_to_gram(code, self.size), count / total) for code, count in zip(self.codes, self.counts)
+            )
+        return self._db
+
+    @staticmethod
+    def _load(filename, n, codes, counts, use_cache):
+        path = get_cache_path(filename, '.npy')
+        if use_cache and is_fresh(filename, path):
+            return np.load(path, mmap_mode='r')
+
+        log_probabilities = get_log_probabilities(n, codes, counts)
+        if use_cache:
+            try:
+                write_log_probabilities(filename, log_probabilities)
+            except OSError:
+                pass
+        return log_probabilities
+
+    @property
+    def table(self):
+        # plain list for the swap scorer's per-gram lookups, which numpy scalars slow down
+        if self._table is None:
+            self._table = self.log_probabilities.tolist()
+        return self._table
+
+    def score_indices(self, indices: np.ndarray) -> float:
+        return float(self.log_probabilities[get_gram_codes(indices, self.size)].sum())
+
+
+class LogNGrams(NGrams):
+    n_gram_class = LogNGram
+
+    @classmethod
+    def build_cache(cls):
+        paths = super().build_cache()
+        for source in cls.get_sources():
+            paths.append(write_log_probabilities(source, get_log_probabilities(*parse_counts(source))))
+        return paths
+
+    @staticmethod
+    def get_cipher_grams(ciphertext, n):
+        return dict(GramCounts(n).update(ciphertext).items())
+
+    def score_indices(self, indices: np.ndarray) -> float:
+        return sum(self.db[i].score_indices(indices) for i in self.sizes) / len(self.sizes)
+
+    def score_key(self, indices: np.ndarray, key: np.ndarray) -> float:
+        # key[c] is the plaintext index of cipher index c
+        return self.score_indices(key[indices])
+
+    def score(self, ciphertext):
+        return self.score_indices(encode(ciphertext))
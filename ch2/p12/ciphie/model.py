@@ -0,0 +1,188 @@
+import io
+import os
+import sys
+import time
+import zipfile
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from ciphie.n_gram_cache import CACHE_VERSION, pack_counts, write_atomic
+from ciphie.n_grams import GramCounts, code_to_gram, get_gram_codes
+from ciphie.stream import CHUNK_SIZE, NON_ALPHABETIC, get_gram_counts_updater, read_letters
+from ciphie.utils import get_mp_context
+
+ORDER_NAMES = {1: 'monograms', 2: 'bigrams', 3: 'trigrams', 4: 'quadgrams', 5: 'quintgrams'}
+
+# orders up to this are counted in a dense 26 ** n array (95 MB at 5), higher ones in a dict
+MAX_DENSE_ORDER = 5
+
+FORMATS = ('text', 'zip', 'binary')
+
+# the binary layout stores codes as uint32
+MAX_BINARY_ORDER = 6
+
+# one slice of the corpus: a file and the byte range of it a worker counts, or '-' for stdin
+Range = Tuple[str, int, Optional[int]]
+
+
+def get_order_name(n: int) -> str:
+    return ORDER_NAMES.get(n, f'{n}grams')
+
+
+def get_ranges(paths: List[str], jobs: int) -> List[Range]:
+    # splits the corpus into about `jobs` byte ranges of similar size
+    if paths == ['-']:
+        return [('-', 0, None)]
+    sizes = {path: os.path.getsize(path) for path in paths}
+    target = max(sum(sizes.values()) // jobs, 1)
+    ranges = []
+    for path in paths:
+        for start in range(0, max(sizes[path], 1), target):
+            ranges.append((path, start, min(start + target, sizes[path])))
+    return ranges
+
+
+def read_range(f: BinaryIO, end: Optional[int], chunk_size: int) -> Iterator[bytes]:
+    position = f.tell()
+    while end is None or position < end:
+        chunk = f.read(chunk_size if end is None else min(chunk_size, end - position))
+        if not chunk:
+            return
+        position += len(chunk)
+        yield chunk
+
+
+def read_tail(f: BinaryIO, letters: int) -> str:
+    # the first few letters after a range, which finish the grams that start inside it
+    tail = ''
+    while len(tail) < letters:
+        chunk = f.read(256)
+        if not chunk:
+            break
+        tail += chunk.lower().translate(None, NON_ALPHABETIC).decode('ascii')
+    return tail[:letters]
+
+
+class SparseGramCounts:
+    # GramCounts for orders too high for a dense array
+    def __init__(self, n: int):
+        self.n = n
+        self.counts = Counter()
+        self.carry = ''
+
+    def update(self, text: str):
+        text = self.carry + text
+        self.counts.update(get_gram_codes(text, self.n))
+        self.carry = text[-(self.n - 1):] if self.n > 1 else ''
+        return self
+
+    def items(self):
+        return self.counts.items()
+
+
+def count_range(corpus_range: Range, orders: List[int], chunk_size: int = CHUNK_SIZE) -> Dict[int, Tuple[array, array]]:
+    path, start, end = corpus_range
+    update_dense = get_gram_counts_updater()
+    gram_counts = {n: GramCounts(n) if n <= MAX_DENSE_ORDER else SparseGramCounts(n) for n in orders}
+
+    def update(letters):
+        for n, counts in gram_counts.items():
+            if isinstance(counts, GramCounts):
+                update_dense(counts, letters)
+            else:
+                counts.update(letters)
+
+    if path == '-':
+        for letters in read_letters(sys.stdin.buffer, chunk_size):
+            update(letters)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            for chunk in read_range(f, end, chunk_size):
+                update(chunk.lower().translate(None, NON_ALPHABETIC).decode('ascii'))
+            tail = read_tail(f, max(orders) - 1)
+        for n, counts in gram_counts.items():
+            # only as many letters as finish grams started in the range, so none is counted twice
+            if isinstance(counts, GramCounts):
+                update_dense(counts, tail[:n - 1])
+            else:
+                counts.update(tail[:n - 1])
+
+    return {n: _to_arrays(counts.items()) for n, counts in gram_counts.items()}
+
+
+def _to_arrays(items) -> Tuple[array, array]:
+    codes, counts = array('Q'), array('Q')
+    for code, count in items:
+        codes.append(code)
+        counts.append(count)
+    return codes, counts
+
+
+def count_corpus(paths: List[str], orders: List[int], jobs: int = 1, chunk_size: int = CHUNK_SIZE) -> Dict[int, Counter]:
+    ranges = get_ranges(paths, jobs)
+    totals = {n: Counter() for n in orders}
+
+    def merge(result):
+        for n, (codes, counts) in result.items():
+            total = totals[n]
+            for code, count in zip(codes, counts):
+                total[code] += count
+
+    if jobs > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=get_mp_context()) as executor:
+            for result in executor.map(count_range, ranges, [orders] * len(ranges), [chunk_size] * len(ranges)):
+                merge(result)
+    else:
+        for corpus_range in ranges:
+            merge(count_range(corpus_range, orders, chunk_size))
+    return totals
+
+
+def get_sorted_table(counts: Counter, min_count: int = 1) -> List[Tuple[int, int]]:
+    # most common first, ties in alphabetical order so the output is reproducible
+    return sorted(((code, count) for code, count in counts.items() if count >= min_count), key=lambda x: (-x[1], x[0]))
+
+
+def format_table(table: List[Tuple[int, int]], n: int) -> bytes:
+    return ''.join(f'{code_to_gram(code, n).upper()} {count}\n' for code, count in table).encode('ascii')
+
+
+def write_table(table: List[Tuple[int, int]], n: int, output: str, name: str, file_format: str) -> str:
+    filename = f'{name}_{get_order_name(n)}'
+    if file_format == 'binary':
+        path = os.path.join(output, f'{filename}.v{CACHE_VERSION}.bin')
+        write_atomic(path, pack_counts(n, array('I', (code for code, _ in table)), array('Q', (count for _, count in table))))
+        return path
+
+    data = format_table(table, n)
+    if file_format == 'zip':
+        path = os.path.join(output, f'{filename}.txt.zip')
+        buffer = io.BytesIO()
+        # a fixed timestamp, so the same corpus always gives the same archive
+        info = zipfile.ZipInfo(f'{filename}.txt', date_time=(1980, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(buffer, 'w') as z:
+            z.writestr(info, data)
+        data = buffer.getvalue()
+    else:
+        path = os.path.join(output, f'{filename}.txt')
+    write_atomic(path, data)
+    return path
+
+
+def build_model(args):
+    if args.format == 'binary' and max(args.orders) > MAX_BINARY_ORDER:
+        print(f'Error: the binary format holds grams of up to {MAX_BINARY_ORDER} letters')
+        sys.exit(1)
+
+    start = time.time()
+    totals = count_corpus(args.corpus, args.orders, args.jobs, args.chunk_size)
+    for n in args.orders:
+        table = get_sorted_table(totals[n], args.min_count)
+        path = write_table(table, n, args.output, args.name, args.format)
+        print(f'{path}: {len(table)} {get_order_name(n)}, {sum(totals[n].values())} counted')
+    if args.verbose:
+        print(f'time elapsed: {round(time.time() - start, 2)}s')
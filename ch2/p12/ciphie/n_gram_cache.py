@@ -0,0 +1,77 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Optional, Tuple
+
+path_to_parent_folder = os.path.dirname(os.path.abspath(__file__))
+cache_folder = os.path.join(path_to_parent_folder, 'data', 'cache')
+
+# bump whenever the layout below changes so stale caches are ignored
+CACHE_VERSION = 1
+MAGIC = b'CPHG'
+
+# magic, version, gram size, number of entries; followed by the base-26 codes
+# as uint32 and the corpus counts as uint64, both little-endian and in file order
+HEADER = struct.Struct('<4sHHI')
+
+Counts = Tuple[int, array, array]
+
+
+def get_cache_path(source: str, extension: str = '.bin') -> str:
+    name = os.path.basename(source).split('.')[0]
+    return os.path.join(cache_folder, f'{name}.v{CACHE_VERSION}{extension}')
+
+
+def is_fresh(source: str, cache_path: str) -> bool:
+    return os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(source)
+
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def read_counts(source: str) -> Optional[Counts]:
+    path = get_cache_path(source)
+    if not is_fresh(source, path):
+        return None
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, n, entries = HEADER.unpack_from(mm)
+        if magic != MAGIC or version != CACHE_VERSION:
+            return None
+        offset = HEADER.size
+        codes = array('I', mm[offset:offset + 4 * entries])
+        offset += 4 * entries
+        counts = array('Q', mm[offset:offset + 8 * entries])
+
+    return n, _little_endian(codes), _little_endian(counts)
+
+
+def write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def pack_counts(n: int, codes: array, counts: array) -> bytes:
+    data = HEADER.pack(MAGIC, CACHE_VERSION, n, len(codes))
+    return data + _little_endian(codes).tobytes() + _little_endian(counts).tobytes()
+
+
+def write_counts(source: str, n: int, codes: array, counts: array) -> str:
+    path = get_cache_path(source)
+    write_atomic(path, pack_counts(n, codes, counts))
+    return path
@@ -1,7 +1,10 @@
 import os
 import re
 import zipfile
-from collections import Counter, OrderedDict, namedtuple
+from array import array
+from collections import OrderedDict, namedtuple
+
+from ciphie.n_gram_cache import read_counts, write_counts
 
 path_to_parent_folder = os.path.dirname(os.path.abspath(__file__))
 data_folder = os.path.join(path_to_parent_folder, 'data')
@@ -9,20 +12,95 @@ data_folder = os.path.join(path_to_parent_folder, 'data')
 Frequency = namedtuple('Frequency', ['count', 'percentage'])
 
 
+def gram_to_code(gram: str) -> int:
+    code = 0
+    for ch in gram:
+        code = code * 26 + ord(ch) - ord('a')
+    return code
+
+
+def code_to_gram(code: int, n: int) -> str:
+    letters = []
+    for _ in range(n):
+        code, letter = divmod(code, 26)
+        letters.append(chr(letter + ord('a')))
+    return ''.join(reversed(letters))
+
+
+def get_gram_codes(ciphertext: str, n: int):
+    # base-26 code of every overlapping window, rolled forward one letter at a time
+    modulus = 26 ** (n - 1)
+    code = 0
+    for i, letter in enumerate(ciphertext.encode('ascii')):
+        code = code % modulus * 26 + letter - ord('a')
+        if i >= n - 1:
+            yield code
+
+
+class GramCounts:
+    # counts of every overlapping n-gram, stored flat by base-26 code
+    def __init__(self, n: int):
+        self.n = n
+        # 64 bit counts, so streamed inputs of any size cannot overflow them
+        self.counts = array('Q', bytes(8 * 26 ** n))
+        # distinct codes in the order they were first seen, so sparse tables can be walked cheaply
+        self.codes = []
+        self.total = 0
+        # the last n - 1 letters seen, so windows spanning two updates are counted too
+        self.carry = ''
+
+    def update(self, ciphertext: str):
+        counts = self.counts
+        codes = self.codes
+        ciphertext = self.carry + ciphertext
+        for code in get_gram_codes(ciphertext, self.n):
+            if not counts[code]:
+                codes.append(code)
+            counts[code] += 1
+            self.total += 1
+        self.carry = ciphertext[-(self.n - 1):] if self.n > 1 else ''
+        return self
+
+    def items(self):
+        counts = self.counts
+        return ((code, counts[code]) for code in self.codes)
+
+
 class Frequencies:
-    def __init__(self, ciphertext):
-        self.monograms = self.get_ciphertext_statistics(ciphertext, 1)
-        self.diagrams = self.get_ciphertext_statistics(ciphertext, 2)
-        self.trigrams = self.get_ciphertext_statistics(ciphertext, 3)
-        self.quintgrams = self.get_ciphertext_statistics(ciphertext, 4)
+    sizes = (1, 2, 3, 4)
+
+    def __init__(self, ciphertext=''):
+        self.counts = {n: GramCounts(n) for n in self.sizes}
+        self._statistics = {}
+        self.update(ciphertext)
 
-        self.__dict__[1] = self.monograms
-        self.__dict__[2] = self.diagrams
-        self.__dict__[3] = self.trigrams
-        self.__dict__[4] = self.quintgrams
+    def update(self, ciphertext, update_gram_counts=GramCounts.update):
+        for gram_counts in self.counts.values():
+            update_gram_counts(gram_counts, ciphertext)
+        self._statistics.clear()
+        return self
 
     def __getitem__(self, index):
-        return self.__dict__[index]
+        # sorted views are only built once something asks for them
+        if index not in self._statistics:
+            self._statistics[index] = self.get_statistics(self.counts[index])
+        return self._statistics[index]
+
+    @property
+    def monograms(self):
+        return self[1]
+
+    @property
+    def diagrams(self):
+        return self[2]
+
+    @property
+    def trigrams(self):
+        return self[3]
+
+    @property
+    def quintgrams(self):
+        return self[4]
     
     @staticmethod
     def _display_n_gram(stats):
@@ -40,14 +118,19 @@ class Frequencies:
         self._display_n_gram(self.trigrams)
         print('Quintgrams frequencies:')
         self._display_n_gram(self.quintgrams)
-        
+
     @staticmethod
-    def get_ciphertext_statistics(ciphertext: str, group_size: int = 1):        
-        l = len(ciphertext)
-        groups = [ciphertext[i:i+group_size] for i in range(0, l, group_size)]
-        c = Counter(groups)
+    def get_statistics(gram_counts: GramCounts):
+        n = gram_counts.n
+        total = gram_counts.total
+        return OrderedDict(sorted(
+            ((code_to_gram(code, n), Frequency(count, count / total)) for code, count in gram_counts.items()),
+            key=lambda x: x[1], reverse=True
+        ))
         
-        return OrderedDict(sorted(((ch, Frequency(freq, freq / l)) for ch, freq in c.items()), key=lambda x: x[1], reverse=True))
+    @staticmethod
+    def get_ciphertext_statistics(ciphertext: str, group_size: int = 1):
+        return Frequencies.get_statistics(GramCounts(group_size).update(ciphertext))
 
 
 class NGramFile:
@@ -71,32 +154,67 @@ class NGramFile:
             self.zp.close()
     
 
+def parse_counts(filename):
+    codes = array('I')
+    counts = array('Q')
+    with NGramFile(filename) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                gram, raw_count = line.decode('ascii').lower().split(' ')
+                codes.append(gram_to_code(gram))
+                counts.append(int(raw_count))
+    return len(gram), codes, counts
+
+
+def load_counts(filename, use_cache=True):
+    cached = read_counts(filename) if use_cache else None
+    if cached:
+        return cached
+
+    n, codes, counts = parse_counts(filename)
+    if use_cache:
+        try:
+            write_counts(filename, n, codes, counts)
+        except OSError:
+            # a read-only install just keeps parsing the text files
+            pass
+    return n, codes, counts
+
+
 class NGram:
-    def __init__(self, filename, max_entries=5000):
-        self.db = self._load(filename, max_entries)
-        self.set = set(self.db.keys())
-    
-    @staticmethod
-    def _load(filename, max_entries):
-        db = OrderedDict()
-        with NGramFile(filename) as f:
-            total = 0
-            for line, _ in zip(f, range(max_entries)):
-                line = line.strip()
-                if line:
-                    gram, raw_count = line.decode('ascii').lower().split(' ')
-                    count = int(raw_count)
-                    total += count
-                    db[gram] = count
-            
-            for gram in db:
-                db[gram] /= total
-        return db
-
-    def score(self, frequencies):
-        total_keys = set(frequencies.keys())
-        intersection = total_keys.intersection(self.set)
-        return sum(self.db[gram] for gram in intersection)
+    def __init__(self, filename, max_entries=5000, use_cache=True):
+        # only the most common grams: this fitness adds up the frequencies of the distinct
+        # grams present, and the long tail of rare ones scores short ciphertexts worse.
+        # None keeps the whole table, as the log-probability fitness always does
+        self.size, self.codes, self.counts = load_counts(filename, use_cache)
+        if max_entries is not None:
+            self.codes, self.counts = self.codes[:max_entries], self.counts[:max_entries]
+        self.total = sum(self.counts)
+        self._db = None
+        self._table = None
+
+    @property
+    def db(self):
+        # relative frequencies by gram, built on first use since large tables take a while
+        if self._db is None:
+            self._db = OrderedDict(
+                (code_to_gram(code, self.size), count / self.total) for code, count in zip(self.codes, self.counts)
+            )
+        return self._db
+
+    def score(self, codes):
+        table = self.table
+        return sum(table[code] for code in codes)
+
+    @property
+    def table(self):
+        # dense lookup indexed by the base-26 code of a gram
+        if self._table is None:
+            self._table = [0.0] * 26 ** self.size
+            for code, count in zip(self.codes, self.counts):
+                self._table[code] = count / self.total
+        return self._table
 
 
 class NGrams:
@@ -104,23 +222,52 @@ class NGrams:
         'english_monograms.txt',
         'english_bigrams.txt',
         'english_trigrams.txt.zip',
-        'english_quintgrams.txt.zip',
+        'english_quadgrams.txt.zip',
     )
-    
-    db = {
-        index + 1: NGram(os.path.join(data_folder, filename)) for index, filename in enumerate(files)
-    }
-    
+
+    n_gram_class = NGram
+    use_cache = True
+    _db = None
+
+    @classmethod
+    def get_sources(cls):
+        return [os.path.join(data_folder, filename) for filename in cls.files]
+
+    @classmethod
+    def load(cls):
+        # the tables are shared by every instance and only read on first use
+        if cls.__dict__.get('_db') is None:
+            cls._db = {
+                index + 1: cls.n_gram_class(source, use_cache=cls.use_cache)
+                for index, source in enumerate(cls.get_sources())
+            }
+        return cls._db
+
+    @classmethod
+    def build_cache(cls):
+        return [write_counts(source, *parse_counts(source)) for source in cls.get_sources()]
+
+    @property
+    def db(self):
+        return self.load()
+
+    # exclude monograms from score
+    sizes = (2, 3, 4)
+
     def __getitem__(self, index):
         return self.db[index]
     
     def get_common_alphabet_in_frequency_order(self):
         return self.db[1].db.keys()
+
+    @staticmethod
+    def get_cipher_grams(ciphertext, n):
+        # codes of the grams the score counts, mapped to how much each one weighs
+        return dict.fromkeys(get_gram_codes(ciphertext, n), 1)
     
     def score(self, ciphertext):
-        # exclude remove monograms from score
         scores = {
-            i: self.db[i].score(Frequencies.get_ciphertext_statistics(ciphertext, i)) 
-            for i in [2, 3, 4]
+            i: self.db[i].score(set(get_gram_codes(ciphertext, i)))
+            for i in self.sizes
         }
         return sum(scores.values()) / len(scores)
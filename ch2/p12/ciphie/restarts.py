@@ -0,0 +1,86 @@
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Collection, Dict, List
+
+from ciphie.Ciphie import Ciphie
+from ciphie.Stats import Stats
+from ciphie.utils import chr_list_to_str, get_mp_context
+
+# number of random swaps applied to the initial key to seed a restart
+PERTURBATION_SWAPS = 6
+
+Restart = namedtuple('Restart', ['index', 'seed', 'score', 'key', 'elapsed', 'cache_hit_rate', 'stats', 'cut_short'])
+
+_worker_ciphie = None
+
+
+def _init_worker(ciphie: Ciphie):
+    global _worker_ciphie
+    # the n-gram tables are class attributes, so a forked worker inherits the
+    # parent's copy instead of loading its own
+    _worker_ciphie = ciphie
+    _worker_ciphie.verbose = False
+
+
+def perturb_key(translation: Dict[int, int], rng: random.Random, pinned: Collection[str] = ()) -> Dict[int, int]:
+    cipher_alphabet = chr_list_to_str(translation.keys())
+    key = list(chr_list_to_str(translation.values()))
+    free = [i for i, ch in enumerate(cipher_alphabet) if ch not in pinned]
+    if len(free) < 2:
+        return translation
+    for _ in range(PERTURBATION_SWAPS):
+        i, j = rng.sample(free, 2)
+        key[i], key[j] = key[j], key[i]
+    return str.maketrans(cipher_alphabet, ''.join(key))
+
+
+def run_restart(index: int, seed: int, initial_key: Dict[int, int], pinned: Collection[str] = ()) -> Restart:
+    start = time.time()
+    ciphie = _worker_ciphie
+    ciphie.strategy.seed(seed)
+    # fresh stats per restart, merged into the parent's when it is done
+    ciphie.stats = Stats(ciphie.stats.start)
+    # restart 0 climbs from the unperturbed key so restarts never do worse than a single run
+    key = initial_key if index == 0 else perturb_key(initial_key, random.Random(seed), pinned)
+    score = ciphie.score(key)
+    ciphie.cut_short = False
+    score, key = ciphie.guess_key_with_swaps(score, key, pinned)
+    # the worker's score cache carries over between the restarts it runs
+    cache_hit_rate = ciphie.score_cache.hit_rate if ciphie.score_cache is not None else None
+    return Restart(index, seed, score, key, time.time() - start, cache_hit_rate, ciphie.stats, ciphie.cut_short)
+
+
+def decode_with_restarts(ciphie: Ciphie, restarts: int, jobs: int, seed: int = 0) -> List[Restart]:
+    _, initial_key = ciphie.guess_initial_key()
+    pinned = ()
+    if ciphie.patterns:
+        initial_key, pinned = ciphie.guess_key_with_patterns(initial_key)
+    seeds = random.Random(seed).sample(range(2 ** 32), restarts)
+
+    log = []
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=get_mp_context(),
+        initializer=_init_worker,
+        initargs=(ciphie,),
+    ) as executor:
+        futures = [executor.submit(run_restart, index, seeds[index], initial_key, pinned) for index in range(restarts)]
+        for future in as_completed(futures):
+            restart = future.result()
+            log.append(restart)
+            ciphie.stats.merge(restart.stats)
+            if ciphie.verbose:
+                best_score = max(r.score for r in log)
+                cache = '' if restart.cache_hit_rate is None else f', {round(restart.cache_hit_rate * 100, 1)}% cache hits'
+                print(
+                    f'restart {restart.index:>3} (seed {restart.seed}): score {restart.score:.6f} '
+                    f'in {round(restart.elapsed, 2)}s, best so far {best_score:.6f} '
+                    f'after {len(log)}/{restarts}{cache}'
+                )
+
+    best = max(log, key=lambda r: (r.score, -r.index))
+    ciphie.best_score, ciphie.best_key = best.score, best.key
+    ciphie.cut_short = any(r.cut_short for r in log)
+    return log
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from ciphie import batch
+from ciphie.args import create_arg_parser, get_ciphie
+from ciphie.ResultCache import get_digest
+from ciphie.utils import get_mp_context
+from ciphie.WordAutomaton import WordAutomaton
+
+# latencies kept for the percentiles in the metrics
+LATENCY_WINDOW = 1000
+
+# a client that can't reach the service within this long solves locally instead
+CONNECT_TIMEOUT = 0.5
+
+HTTP_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+
+
+def get_options_error(options: dict) -> Optional[str]:
+    # the solver options of a request are checked the way the command line checks them,
+    # so a bad one gets a short answer instead of failing in a worker
+    actions = {action.dest: action for action in create_arg_parser()._actions}
+    for name, value in options.items():
+        if name not in batch.SOLVER_OPTIONS:
+            return f'unknown option {name}'
+        action = actions[name]
+        if value is None and action.default is None:
+            continue
+        if action.nargs == 0:
+            valid = isinstance(value, bool)
+        elif action.type in (int, float):
+            valid = isinstance(value, action.type if action.type is int else (int, float)) and not isinstance(value, bool)
+        else:
+            valid = isinstance(value, str)
+        if not valid or (action.choices is not None and value not in action.choices):
+            return f'invalid value for option {name}'
+    for name in ('temperature', 'final_temperature'):
+        if options.get(name) is not None and options[name] <= 0:
+            return f'{name} must be greater than 0'
+    return None
+
+
+def _init_worker(args):
+    # Ctrl-C stops the service, which shuts the workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    batch._init_worker(args)
+
+
+class SolveService:
+    # Solves on a pool of worker processes forked after the n-gram tables are loaded,
+    # so no request pays for loading them. Concurrent requests for the same ciphertext
+    # share a single solve.
+    def __init__(self, args):
+        self.executor = ProcessPoolExecutor(
+            max_workers=args.jobs,
+            mp_context=get_mp_context(),
+            initializer=_init_worker,
+            initargs=(args,),
+        )
+        self.pending = {}
+        self.started = time.time()
+        self.requests = 0
+        self.coalesced = 0
+        self.solved = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    async def solve(self, job_id: str, ciphertext: str, options: Optional[dict] = None) -> dict:
+        start = time.time()
+        self.requests += 1
+        # only requests with the same solver options can share a solve
+        digest = get_digest(ciphertext.lower() + json.dumps(options, sort_keys=True))
+        future = self.pending.get(digest)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, batch.solve, job_id, ciphertext, options)
+            self.pending[digest] = future
+            future.add_done_callback(lambda _: self.pending.pop(digest, None))
+        else:
+            self.coalesced += 1
+        try:
+            # shielded, so a client that disconnects doesn't cancel the solve for the others
+            result = await asyncio.shield(future)
+        except Exception:
+            self.errors += 1
+            raise
+        self.solved += 1
+        self.latencies.append(time.time() - start)
+        return {**result, 'id': job_id, 'elapsed': round(time.time() - start, 4)}
+
+    def get_metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)], 4) if latencies else None
+
+        return {
+            'uptime': round(time.time() - self.started, 2),
+            'queue_depth': len(self.pending),
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'solved': self.solved,
+            'errors': self.errors,
+            'latency': {'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99)},
+        }
+
+    async def handle(self, message) -> dict:
+        if not isinstance(message, dict):
+            return {'error': 'expected {"ciphertext": "...", "options": {...}} or {"command": "metrics"}'}
+        if message.get('command') == 'metrics':
+            return self.get_metrics()
+        options = message.get('options')
+        if not isinstance(message.get('ciphertext'), str) or not isinstance(options, (dict, type(None))):
+            return {'error': 'expected {"ciphertext": "...", "options": {...}} or {"command": "metrics"}'}
+        error = get_options_error(options) if options is not None else None
+        if error is not None:
+            return {'error': error}
+        job_id = str(message.get('id', self.requests))
+        try:
+            return await self.solve(job_id, message['ciphertext'], options)
+        except Exception as e:
+            # the details are for the service's log, not the client
+            print(f'request {job_id} failed: {e!r}', file=sys.stderr)
+            return {'error': 'solve failed'}
+
+    async def handle_lines(self, reader, writer):
+        # one JSON object per line, answered in order
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle(json.loads(line))
+                except ValueError:
+                    response = {'error': 'invalid JSON'}
+                writer.write(json.dumps(response).encode('ascii') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http(self, reader, writer):
+        # just enough HTTP/1.0 for POST /solve and GET /metrics
+        try:
+            request_line = (await reader.readline()).decode('ascii', 'replace').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('ascii', 'replace').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            status, response = 404, {'error': 'POST /solve or GET /metrics'}
+            if request_line[:2] == ['GET', '/metrics']:
+                status, response = 200, self.get_metrics()
+            elif request_line[:2] == ['POST', '/solve']:
+                try:
+                    response = await self.handle(json.loads(body))
+                    status = 400 if 'error' in response else 200
+                except ValueError:
+                    status, response = 400, {'error': 'invalid JSON'}
+
+            data = json.dumps(response).encode('ascii')
+            writer.write(
+                f'HTTP/1.0 {status} {HTTP_STATUS[status]}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(data)}\r\n\r\n'.encode('ascii') + data
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run_service(args):
+    service = SolveService(args)
+    if args.port is not None:
+        server = await asyncio.start_server(service.handle_http, '127.0.0.1', args.port)
+        address = f'http://127.0.0.1:{args.port}'
+    else:
+        folder = os.path.dirname(os.path.abspath(args.socket))
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+        if not is_own(folder):
+            print(f'Error: {folder} belongs to another user')
+            sys.exit(1)
+        if os.path.exists(args.socket):
+            if request(args.socket, {'command': 'metrics'}, 5) is not None:
+                print(f'Error: a service is already listening on {args.socket}')
+                sys.exit(1)
+            # left behind by a service that didn't shut down cleanly
+            os.unlink(args.socket)
+        server = await asyncio.start_unix_server(service.handle_lines, args.socket)
+        address = args.socket
+
+    print(f'serving on {address} with {args.jobs} workers', file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.executor.shutdown(cancel_futures=True)
+        if args.port is None and os.path.exists(args.socket):
+            os.unlink(args.socket)
+        if args.verbose:
+            print(json.dumps(service.get_metrics()), file=sys.stderr)
+
+
+def serve(args):
+    # load the shared tables before forking so every worker inherits them
+    get_ciphie(args, '').n_grams.load()
+    if args.words:
+        WordAutomaton.load()
+    try:
+        asyncio.run(run_service(args))
+    except KeyboardInterrupt:
+        pass
+
+
+def is_own(path: str) -> bool:
+    # a socket someone else made would receive the ciphertexts sent to it, and could answer with any key
+    if not hasattr(os, 'getuid'):
+        return True
+    try:
+        return os.stat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def request(path: str, message: dict, timeout: Optional[float] = None) -> Optional[dict]:
+    # sends one message to the service on the Unix socket at path, or returns None if none of
+    # this user's is running, or it doesn't answer within timeout seconds
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path) or not is_own(path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(CONNECT_TIMEOUT)
+        try:
+            client.connect(path)
+            client.settimeout(timeout)
+            client.sendall(json.dumps(message).encode('ascii') + b'\n')
+            with client.makefile('rb') as f:
+                line = f.readline()
+        except OSError:
+            return None
+    try:
+        return json.loads(line) if line else None
+    except ValueError:
+        return None
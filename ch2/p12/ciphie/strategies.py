@@ -0,0 +1,297 @@
+import math
+import random
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Callable, Collection, List, Optional, Tuple
+
+from ciphie.SwapScorer import SwapScorer
+
+ALPHABET_LENGTH = 26
+SWAPS = [(i, j) for i in range(ALPHABET_LENGTH) for j in range(i + 1, ALPHABET_LENGTH)]
+
+Report = Callable[[float, str], None]
+Swaps = List[Tuple[int, int]]
+
+
+def get_free_swaps(cipher_alphabet: str, pinned: Collection[str]) -> Swaps:
+    # swaps that leave the pinned cipher letters where they are
+    return [(i, j) for i, j in SWAPS if cipher_alphabet[i] not in pinned and cipher_alphabet[j] not in pinned]
+
+
+class SearchStrategy:
+    name = None
+    options = ('max_iterations', 'time_limit', 'seed')
+    # searches that score whole neighbourhoods at once get a BatchScorer, which needs numpy
+    batched = False
+
+    def __init__(self, max_iterations: Optional[int] = None, time_limit: Optional[float] = None, seed: int = 0):
+        # an iteration is one candidate key evaluated by the scorer
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+        # whether the caller set a limit, and whether the last search stopped on it before running its course
+        self.limited = max_iterations is not None or time_limit is not None
+        self.cut_short = False
+        self.iterations = 0
+        self.deadline = None
+        # set by the caller to time the passes of the search
+        self.stats = None
+        # set by the caller to save the search state every checkpoint_interval seconds
+        self.checkpoint = None
+        self.checkpoint_interval = 30.0
+        self.last_checkpoint = None
+        # keys already evaluated, and seconds already spent, by the search being resumed
+        self.resumed_iterations = 0
+        self.resumed_elapsed = 0.0
+        # anything else of its own a strategy needs to carry on, as from get_state
+        self.resumed_state = {}
+        self.started = None
+        self.seed(seed)
+
+    def seed(self, seed: int):
+        self.random = random.Random(seed)
+
+    def resume(self, iterations: int, random_state, elapsed: float = 0.0, state: Optional[dict] = None):
+        # the next search carries on counting from iterations and elapsed seconds, with the
+        # random state it was saved with, so its limits hold across the interruptions
+        self.resumed_iterations = iterations
+        self.resumed_elapsed = elapsed
+        self.resumed_state = state or {}
+        self.random.setstate(random_state)
+
+    def get_state(self) -> dict:
+        # what a checkpoint keeps for resume besides the iterations and random state
+        return {}
+
+    def _start(self):
+        self.iterations = self.resumed_iterations
+        self.started = time.time() - self.resumed_elapsed
+        self.resumed_iterations = 0
+        self.resumed_elapsed = 0.0
+        self.resumed_state = {}
+        self.cut_short = False
+        self.deadline = None if self.time_limit is None else self.started + self.time_limit
+        self.last_checkpoint = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.started if self.started is not None else 0.0
+
+    def _phase(self, name: str):
+        return self.stats.phase(name) if self.stats is not None else nullcontext()
+
+    def _exhausted(self) -> bool:
+        # polled before every key evaluated, so it doubles as the checkpoint timer
+        if self.checkpoint is not None and time.time() - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+            self.last_checkpoint = time.time()
+        exhausted = self.max_iterations is not None and self.iterations >= self.max_iterations
+        exhausted = exhausted or (self.deadline is not None and time.time() >= self.deadline)
+        self.cut_short = self.cut_short or (exhausted and self.limited)
+        return exhausted
+
+    def spend(self) -> bool:
+        # counts a key evaluated after the search, as by the dictionary word climb, against the
+        # same limits; False once they are reached
+        if self._exhausted():
+            return False
+        self.iterations += 1
+        return True
+
+    def _evaluate(self, scorer: SwapScorer, i: int, j: int) -> float:
+        self.iterations += 1
+        return scorer.swap_delta(i, j)
+
+    def _evaluate_all(self, scorer: SwapScorer, swaps: Swaps) -> List[float]:
+        self.iterations += len(swaps)
+        if hasattr(scorer, 'neighbour_deltas'):
+            return scorer.neighbour_deltas(swaps).tolist()
+        return [scorer.swap_delta(i, j) for i, j in swaps]
+
+    def search(self, scorer: SwapScorer, report: Report, swaps: Swaps = SWAPS) -> float:
+        # leaves the scorer holding the best key found and returns its score
+        raise NotImplementedError
+
+
+class HillClimb(SearchStrategy):
+    name = 'hill-climb'
+
+    def search(self, scorer, report, swaps=SWAPS):
+        self._start()
+        best_score = scorer.score
+        improvement = True
+
+        while improvement:
+            improvement = False
+            with self._phase('swap pass'):
+                for i, j in swaps:
+                    if self._exhausted():
+                        return best_score
+                    if best_score < scorer.score + self._evaluate(scorer, i, j):
+                        improvement = True
+                        best_score = scorer.swap(i, j)
+                        report(best_score, scorer.get_key())
+
+        return best_score
+
+
+class BestImprovement(SearchStrategy):
+    name = 'best-improvement'
+    batched = True
+
+    def search(self, scorer, report, swaps=SWAPS):
+        # scores the whole neighbourhood of the key in one batch and makes the best swap,
+        # until none of them improves the score
+        self._start()
+        best_score = scorer.score
+
+        while swaps and not self._exhausted():
+            # the last batch is cut to what is left of --max-iterations; --time-limit is only
+            # checked between batches, which take a few milliseconds each
+            batch = swaps
+            if self.max_iterations is not None:
+                batch = swaps[:self.max_iterations - self.iterations]
+            with self._phase('neighbourhood'):
+                deltas = self._evaluate_all(scorer, batch)
+            best = max(range(len(deltas)), key=deltas.__getitem__)
+            if deltas[best] <= 0:
+                break
+            score = scorer.swap(*batch[best])
+            if score <= best_score:
+                # the batch sums in a different order, so a swap that changes nothing can
+                # still look like a rounding-sized improvement
+                scorer.swap(*batch[best])
+                break
+            best_score = score
+            report(best_score, scorer.get_key())
+
+        return best_score
+
+
+class SimulatedAnnealing(SearchStrategy):
+    name = 'annealing'
+    options = SearchStrategy.options + ('temperature', 'final_temperature', 'schedule')
+    schedules = ('geometric', 'linear')
+
+    def __init__(self, max_iterations=None, time_limit=None, seed=0,
+                 temperature: float = 0.2, final_temperature: float = 0.01,
+                 schedule: str = 'geometric'):
+        super().__init__(max_iterations, time_limit, seed)
+        if not self.limited:
+            # the schedule needs an end, and reaching this one doesn't cut the search short
+            self.max_iterations = 5000
+        # temperatures are relative to the typical size of a score change, measured when the search starts
+        self.scale = None
+        self.temperature = temperature
+        self.final_temperature = final_temperature
+        self.schedule = schedule
+
+    def _calibrate(self, scorer: SwapScorer, swaps: Swaps, samples: int = 50) -> float:
+        deltas = [abs(self._evaluate(scorer, *self.random.choice(swaps))) for _ in range(samples)]
+        return sum(deltas) / samples or 1.0
+
+    def _progress(self) -> float:
+        progress = 0.0
+        if self.max_iterations is not None:
+            progress = self.iterations / self.max_iterations
+        if self.time_limit is not None:
+            progress = max(progress, 1 - (self.deadline - time.time()) / self.time_limit)
+        return min(progress, 1.0)
+
+    def _temperature(self, start: float, end: float) -> float:
+        progress = self._progress()
+        if self.schedule == 'linear':
+            return start + (end - start) * progress
+        if start <= 0 or end <= 0:
+            # a geometric schedule never reaches or leaves zero, so only improvements are accepted
+            return 0.0
+        return start * (end / start) ** progress
+
+    def get_state(self):
+        return {'scale': self.scale}
+
+    def search(self, scorer, report, swaps=SWAPS):
+        # a resumed search keeps the scale it was calibrated with, so the schedule carries on unchanged
+        scale = self.resumed_state.get('scale')
+        self._start()
+        if not swaps:
+            return scorer.score
+        self.scale = scale if scale is not None else self._calibrate(scorer, swaps)
+        start = self.temperature * self.scale
+        end = min(self.final_temperature * self.scale, start)
+
+        score = best_score = scorer.score
+        best_key = scorer.get_key()
+
+        while not self._exhausted():
+            temperature = self._temperature(start, end)
+            i, j = self.random.choice(swaps)
+            delta = self._evaluate(scorer, i, j)
+            if delta > 0 or (temperature > 0 and self.random.random() < math.exp(delta / temperature)):
+                score = scorer.swap(i, j)
+                if score > best_score:
+                    best_score, best_key = score, scorer.get_key()
+                    report(best_score, best_key)
+
+        scorer.set_key(scorer.cipher_alphabet, best_key)
+        return best_score
+
+
+class TabuSearch(SearchStrategy):
+    name = 'tabu'
+    options = SearchStrategy.options + ('tenure', 'candidates', 'patience')
+
+    def __init__(self, max_iterations=None, time_limit=None, seed=0,
+                 tenure: int = 8, candidates: int = 100, patience: int = 30):
+        super().__init__(max_iterations, time_limit, seed)
+        # each move picks the best of a random sample of `candidates` swaps; swaps
+        # of recently moved letter pairs are tabu for `tenure` moves unless they
+        # beat the best score, and the search stops after `patience` moves
+        # without a new best
+        self.tenure = tenure
+        self.candidates = min(candidates, len(SWAPS))
+        self.patience = patience
+
+    def search(self, scorer, report, swaps=SWAPS):
+        self._start()
+        best_score = scorer.score
+        best_key = scorer.get_key()
+        candidates = min(self.candidates, len(swaps))
+        tabu = deque(maxlen=self.tenure)
+        stale = 0
+
+        while stale < self.patience and not self._exhausted():
+            move, move_delta = None, None
+            for i, j in self.random.sample(swaps, candidates):
+                if self._exhausted():
+                    break
+                delta = self._evaluate(scorer, i, j)
+                letters = frozenset(scorer.cipher_alphabet[k] for k in (i, j))
+                if letters in tabu and scorer.score + delta <= best_score:
+                    continue
+                if move_delta is None or delta > move_delta:
+                    move, move_delta = (i, j, letters), delta
+
+            if move is None:
+                break
+
+            i, j, letters = move
+            score = scorer.swap(i, j)
+            tabu.append(letters)
+            if score > best_score:
+                best_score, best_key = score, scorer.get_key()
+                report(best_score, best_key)
+                stale = 0
+            else:
+                stale += 1
+
+        scorer.set_key(scorer.cipher_alphabet, best_key)
+        return best_score
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (HillClimb, BestImprovement, SimulatedAnnealing, TabuSearch)}
+
+
+def create_strategy(name: str = HillClimb.name, **options) -> SearchStrategy:
+    strategy = STRATEGIES[name]
+    return strategy(**{k: v for k, v in options.items() if v is not None and k in strategy.options})
@@ -0,0 +1,84 @@
+import random
+from typing import BinaryIO, Iterator, Tuple
+
+from ciphie.n_grams import Frequencies, GramCounts
+
+CHUNK_SIZE = 1 << 20
+BLOCK_SIZE = 500
+
+NON_ALPHABETIC = bytes(ch for ch in range(256) if not ord('a') <= ch <= ord('z'))
+
+
+def read_letters(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    # lowercase letters of the input, one fixed-size chunk at a time
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk.lower().translate(None, NON_ALPHABETIC).decode('ascii')
+
+
+# Keeps a uniform random sample of fixed-size blocks of the stream (reservoir
+# sampling), so the sample spreads over the whole input in bounded memory.
+class BlockSampler:
+    def __init__(self, sample_size: int, block_size: int = BLOCK_SIZE, seed: int = 0):
+        self.block_size = block_size
+        self.capacity = max(sample_size // block_size, 1)
+        self.random = random.Random(seed)
+        self.reservoir = []
+        self.blocks = 0
+        self.buffer = ''
+
+    def _add_block(self, block: str):
+        if len(self.reservoir) < self.capacity:
+            self.reservoir.append((self.blocks, block))
+        else:
+            slot = self.random.randrange(self.blocks + 1)
+            if slot < self.capacity:
+                self.reservoir[slot] = (self.blocks, block)
+        self.blocks += 1
+
+    def update(self, letters: str):
+        self.buffer += letters
+        full_blocks = len(self.buffer) // self.block_size * self.block_size
+        for start in range(0, full_blocks, self.block_size):
+            self._add_block(self.buffer[start:start + self.block_size])
+        self.buffer = self.buffer[full_blocks:]
+
+    def get_sample(self) -> str:
+        if self.buffer:
+            self._add_block(self.buffer)
+            self.buffer = ''
+        return ''.join(block for _, block in sorted(self.reservoir))
+
+
+def get_gram_counts_updater():
+    try:
+        import numpy as np
+        from ciphie.log_n_grams import encode, get_gram_codes
+    except ImportError:
+        return GramCounts.update
+
+    # same counts as GramCounts.update, one bincount per chunk instead of a python loop per letter
+    def update(gram_counts: GramCounts, letters: str):
+        text = gram_counts.carry + letters
+        codes = get_gram_codes(encode(text), gram_counts.n)
+        chunk_counts = np.bincount(codes, minlength=26 ** gram_counts.n).astype(np.uint64)
+        counts = np.frombuffer(gram_counts.counts, dtype=np.uint64)
+        gram_counts.codes.extend(np.flatnonzero((chunk_counts > 0) & (counts == 0)).tolist())
+        counts += chunk_counts
+        gram_counts.total += len(codes)
+        gram_counts.carry = text[-(gram_counts.n - 1):] if gram_counts.n > 1 else ''
+
+    return update
+
+
+def read_stream(f: BinaryIO, sample_size: int, chunk_size: int = CHUNK_SIZE, seed: int = 0) -> Tuple[str, Frequencies]:
+    # exact n-gram counts of the whole input, plus a sample of it small enough to search keys on
+    frequencies = Frequencies()
+    update_gram_counts = get_gram_counts_updater()
+    sampler = BlockSampler(sample_size, seed=seed)
+    for letters in read_letters(f, chunk_size):
+        frequencies.update(letters, update_gram_counts)
+        sampler.update(letters)
+    return sampler.get_sample(), frequencies
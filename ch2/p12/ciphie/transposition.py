@@ -0,0 +1,259 @@
+import math
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from ciphie.log_n_grams import encode, get_gram_codes
+from ciphie.n_grams import NGrams
+from ciphie.strings import BAR
+from ciphie.utils import get_mp_context
+from ciphie.vigenere import to_text
+
+STRATEGIES = ('hill-climb', 'annealing')
+
+# random column orders each width is searched from, besides the identity
+CLIMBS = 2
+
+# annealing steps per width when --max-iterations is not given, shared by its starting orders
+ANNEALING_STEPS = 50000
+
+# annealing temperatures, relative to the typical score change of a move, and how they fall
+SCHEDULE = (0.2, 0.01, 'geometric')
+
+# floor for digrams missing from the table, relative to the rarest one present
+DIGRAM_FLOOR = 0.1
+
+WidthStatistics = namedtuple('WidthStatistics', ['widths', 'digram'])
+TranspositionResult = namedtuple('TranspositionResult', ['width', 'order', 'score', 'plaintext', 'elapsed', 'statistics', 'scores'])
+
+
+def get_column_lengths(n: int, width: int) -> np.ndarray:
+    # the first n % width columns have one letter more
+    lengths = np.full(width, n // width)
+    lengths[:n % width] += 1
+    return lengths
+
+
+def get_indices(n: int, order: np.ndarray) -> np.ndarray:
+    # ciphertext position of every plaintext letter, for columns read out in `order`
+    width = len(order)
+    lengths = get_column_lengths(n, width)
+    starts = np.empty(width, dtype=np.int64)
+    starts[order] = np.concatenate(([0], np.cumsum(lengths[order])[:-1]))
+    positions = np.arange(n)
+    return starts[positions % width] + positions // width
+
+
+def decrypt(codes: np.ndarray, order: np.ndarray) -> np.ndarray:
+    return codes[get_indices(len(codes), order)]
+
+
+def encrypt(codes: np.ndarray, order: np.ndarray) -> np.ndarray:
+    ciphertext = np.empty_like(codes)
+    ciphertext[get_indices(len(codes), order)] = codes
+    return ciphertext
+
+
+def get_digram_log_probabilities(n_grams: NGrams) -> np.ndarray:
+    digrams = n_grams[2]
+    counts = np.asarray(digrams.counts, dtype=np.float64)
+    log_probabilities = np.full(26 * 26, math.log10(DIGRAM_FLOOR * counts.min() / counts.sum()))
+    log_probabilities[np.asarray(digrams.codes, dtype=np.int64)] = np.log10(counts / counts.sum())
+    return log_probabilities
+
+
+def get_width_statistics(codes: np.ndarray, max_width: int, digrams: np.ndarray) -> WidthStatistics:
+    # Under the right width, every column is followed in the plaintext by one of the others,
+    # so pairing each column with the one whose letters make the likeliest digrams with it,
+    # row by row, scores far above any other width. The columns are cut at their average
+    # starts, which is off by at most a row or two where the column lengths differ.
+    n = len(codes)
+    widths = np.arange(2, max(min(max_width, n // 2), 2) + 1)
+    statistics = []
+    for width in widths:
+        rows = n // width
+        starts = np.round(np.arange(width) * n / width).astype(np.int64)
+        columns = codes[starts[:, None] + np.arange(rows)[None, :]].astype(np.int64)
+        pairs = digrams[columns[:, None, :] * 26 + columns[None, :, :]].mean(axis=2)
+        np.fill_diagonal(pairs, -np.inf)
+        statistics.append(pairs.max(axis=1).mean())
+    return WidthStatistics(widths, np.array(statistics))
+
+
+class CodeScorer:
+    # NGrams.score over letter codes with numpy, which is what makes hundreds of
+    # thousands of column orders affordable: the log fitness sums every gram, the
+    # frequency fitness the distinct ones
+    def __init__(self, n_grams: NGrams):
+        self.tables = {}
+        for n in n_grams.sizes:
+            log_probabilities = getattr(n_grams[n], 'log_probabilities', None)
+            table = log_probabilities if log_probabilities is not None else n_grams[n].table
+            self.tables[n] = (np.asarray(table, dtype=np.float64), log_probabilities is None)
+
+    def score(self, codes: np.ndarray) -> float:
+        total = 0.0
+        for n, (table, distinct) in self.tables.items():
+            grams = get_gram_codes(codes, n)
+            if distinct:
+                grams = np.unique(grams)
+            total += table[grams].sum()
+        return total / len(self.tables)
+
+
+def get_neighbours(width: int):
+    # Swaps of two entries, then moves of a run of entries to another place, made both
+    # in the order the columns are read out in and in their ranks. Moving runs keeps the
+    # parts a partly solved order has right together, and moving them in the ranks shifts
+    # columns across the plaintext rows, which a climb in the order alone gets stuck on.
+    swaps = [(i, j, 0) for i in range(width) for j in range(i + 1, width)]
+    moves = [(i, j, length) for length in range(1, width) for i in range(width - length + 1)
+             for j in range(width - length + 1) if j != i]
+    return [(inverse, *change) for inverse in (False, True) for change in swaps + moves]
+
+
+def invert(order: List[int]) -> List[int]:
+    inverse = [0] * len(order)
+    for place, column in enumerate(order):
+        inverse[column] = place
+    return inverse
+
+
+def apply(order: List[int], neighbour) -> List[int]:
+    inverse, i, j, length = neighbour
+    order = invert(order) if inverse else list(order)
+    if not length:
+        order[i], order[j] = order[j], order[i]
+    else:
+        run = order[i:i + length]
+        del order[i:i + length]
+        order[j:j] = run
+    return invert(order) if inverse else order
+
+
+_worker = None
+
+
+def _init_worker(n_grams, codes, strategy, max_iterations, seed, schedule):
+    global _worker
+    _worker = (CodeScorer(n_grams), codes.astype(np.int64), strategy, max_iterations, seed, schedule)
+
+
+def climb(scorer: CodeScorer, codes: np.ndarray, order: List[int]):
+    score = scorer.score(decrypt(codes, np.array(order)))
+    neighbours = get_neighbours(len(order))
+    improvement = True
+    while improvement:
+        improvement = False
+        for neighbour in neighbours:
+            candidate = apply(order, neighbour)
+            candidate_score = scorer.score(decrypt(codes, np.array(candidate)))
+            if candidate_score > score:
+                order, score, improvement = candidate, candidate_score, True
+    return score, order
+
+
+def anneal(scorer: CodeScorer, codes: np.ndarray, order: List[int], steps: int, rng: random.Random, schedule=SCHEDULE):
+    neighbours = get_neighbours(len(order))
+    score = scorer.score(decrypt(codes, np.array(order)))
+    best_score, best_order = score, order
+    # temperatures relative to the typical score change of a move, as the substitution annealing does
+    scale = np.mean([abs(scorer.score(decrypt(codes, np.array(apply(order, rng.choice(neighbours))))) - score) for _ in range(50)]) or 1.0
+    temperature, final_temperature, kind = schedule
+    start = temperature * scale
+    end = min(final_temperature * scale, start)
+    for step in range(steps):
+        if kind == 'linear':
+            temperature = start + (end - start) * step / steps
+        else:
+            temperature = start * (end / start) ** (step / steps)
+        candidate = apply(order, rng.choice(neighbours))
+        candidate_score = scorer.score(decrypt(codes, np.array(candidate)))
+        delta = candidate_score - score
+        if delta > 0 or rng.random() < math.exp(delta / temperature):
+            order, score = candidate, candidate_score
+            if score > best_score:
+                best_score, best_order = score, order
+    return climb(scorer, codes, best_order)
+
+
+def search_width(width: int):
+    # the best column order found for one width
+    scorer, codes, strategy, max_iterations, seed, schedule = _worker
+    rng = random.Random(seed * 1000 + width)
+    identity = list(range(width))
+    if width < 2:
+        return scorer.score(codes), identity
+    starts = [identity] + [rng.sample(identity, width) for _ in range(CLIMBS)]
+    if strategy == 'annealing':
+        steps = (max_iterations or ANNEALING_STEPS) // len(starts)
+        return max(anneal(scorer, codes, order, steps, rng, schedule) for order in starts)
+    return max(climb(scorer, codes, order) for order in starts)
+
+
+def break_transposition(ciphertext: str, n_grams: NGrams, strategy: str = 'hill-climb', max_width: int = 20,
+                        width: Optional[int] = None, candidates: int = 4, max_iterations: Optional[int] = None,
+                        seed: int = 0, jobs: int = 1, schedule=SCHEDULE) -> TranspositionResult:
+    start = time.time()
+    codes = encode(''.join(ch for ch in ciphertext.lower() if 'a' <= ch <= 'z'))
+    # every column needs at least two letters to be placed by its neighbours
+    if len(codes) < 2 * (width or 2):
+        raise ValueError(f'a transposition of width {width or 2} needs at least {2 * (width or 2)} letters, the input has {len(codes)}')
+    n_grams.load()
+    statistics = get_width_statistics(codes, max_width, get_digram_log_probabilities(n_grams))
+    if width:
+        widths = [width]
+    else:
+        widths = [int(w) for w in statistics.widths[np.argsort(-statistics.digram, kind='stable')][:candidates]]
+
+    initargs = (n_grams, codes, strategy, max_iterations, seed, schedule)
+    if jobs > 1 and len(widths) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(widths)),
+            mp_context=get_mp_context(),
+            initializer=_init_worker,
+            initargs=initargs,
+        ) as executor:
+            results = list(executor.map(search_width, widths))
+    else:
+        _init_worker(*initargs)
+        results = [search_width(w) for w in widths]
+
+    scores = dict(zip(widths, (score for score, _ in results)))
+    score, order = max(results)
+    plaintext = to_text(decrypt(codes, np.array(order)))
+    return TranspositionResult(len(order), order, score, plaintext, time.time() - start, statistics, scores)
+
+
+def get_ranks(order: List[int]) -> List[int]:
+    # the number written above each column: the place it is read out in, from 1
+    return [place + 1 for place in invert(order)]
+
+
+def format_statistics(result: TranspositionResult) -> str:
+    statistics = result.statistics
+    buffer = [BAR, f"{'width':>6} {'digram':>8} {'score':>12}"]
+    for width, digram in zip(statistics.widths, statistics.digram):
+        score = result.scores.get(int(width))
+        score = '' if score is None else f'{score:.4f}'
+        marker = ' <' if width == result.width else ''
+        buffer.append(f'{width:>6} {digram:>8.4f} {score:>12}{marker}')
+    buffer.append(BAR)
+    return os.linesep.join(buffer)
+
+
+def format_result(result: TranspositionResult) -> str:
+    return os.linesep.join((
+        BAR,
+        f"transposition key: {' '.join(str(rank) for rank in get_ranks(result.order))} (width {result.width})",
+        f'score: {result.score}',
+        f'time to solution: {round(result.elapsed, 2)}s',
+        BAR,
+        result.plaintext,
+        BAR,
+    ))
@@ -1,5 +1,18 @@
+import multiprocessing
+
+
 def list_to_str(lst):
     return ''.join(lst)
 
 def chr_list_to_str(chr_list):
-    return list_to_str(chr(c) for c in chr_list)
\ No newline at end of file
+    return list_to_str(chr(c) for c in chr_list)
+
+def translation_to_key(translation):
+    # plaintext letter for each of a-z in the ciphertext
+    return list_to_str(chr(translation.get(c, c)) for c in range(ord('a'), ord('z') + 1))
+
+def get_mp_context():
+    # forked workers inherit the n-gram tables already loaded in the parent
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
@@ -0,0 +1,191 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from ciphie.log_n_grams import encode
+from ciphie.n_grams import NGrams
+from ciphie.strings import BAR
+from ciphie.utils import get_mp_context
+
+VARIANTS = ('vigenere', 'beaufort')
+
+# periods whose index of coincidence is within this share of the best one count as a fit
+IOC_TOLERANCE = 0.9
+
+# the period statistics hold one row per period for every letter, so they only look this far
+STATISTICS_LETTERS = 100000
+
+# shorter ciphertexts score too fast for worker processes to pay off
+PARALLEL_MIN_LETTERS = 5000
+
+PeriodStatistics = namedtuple('PeriodStatistics', ['periods', 'ioc', 'kasiski'])
+VigenereResult = namedtuple('VigenereResult', ['variant', 'period', 'key', 'score', 'plaintext', 'elapsed', 'statistics'])
+
+
+def get_period_statistics(codes: np.ndarray, max_period: int) -> PeriodStatistics:
+    periods = np.arange(1, max_period + 1)
+    n = len(codes)
+
+    # letter counts of every column of every period from a single bincount: period p owns
+    # the rows offsets[p - 1] .. offsets[p - 1] + p - 1, one row of 26 counts per column
+    offsets = np.concatenate(([0], np.cumsum(periods)[:-1]))
+    rows = offsets[:, None] + np.arange(n)[None, :] % periods[:, None]
+    counts = np.bincount((rows * 26 + codes[None, :]).ravel(), minlength=periods.sum() * 26)
+    counts = counts.reshape(-1, 26).astype(np.float64)
+
+    totals = counts.sum(axis=1)
+    column_ioc = (counts * (counts - 1)).sum(axis=1) / np.maximum(totals * (totals - 1), 1)
+    ioc = np.add.reduceat(column_ioc, offsets) / periods
+
+    # distances between consecutive repeats of the same trigram, and the share of them each period divides
+    trigrams = codes[:-2].astype(np.int64) * 676 + codes[1:-1] * 26 + codes[2:] if n >= 3 else np.zeros(0, np.int64)
+    order = np.argsort(trigrams, kind='stable')
+    repeated = trigrams[order][1:] == trigrams[order][:-1]
+    distances = (order[1:] - order[:-1])[repeated]
+    if len(distances):
+        kasiski = (distances[:, None] % periods[None, :] == 0).mean(axis=0)
+    else:
+        kasiski = np.zeros(max_period)
+
+    return PeriodStatistics(periods, ioc, kasiski)
+
+
+def guess_period(statistics: PeriodStatistics) -> int:
+    # multiples of the period fit about as well as the period itself, so take the shortest good one
+    threshold = IOC_TOLERANCE * statistics.ioc.max()
+    return int(statistics.periods[np.argmax(statistics.ioc >= threshold)])
+
+
+def decrypt(codes: np.ndarray, key: np.ndarray, variant: str) -> np.ndarray:
+    shifts = key[np.arange(len(codes)) % len(key)]
+    if variant == 'beaufort':
+        return (shifts - codes) % 26
+    return (codes - shifts) % 26
+
+
+def to_text(codes: np.ndarray) -> str:
+    return (codes + ord('a')).astype(np.uint8).tobytes().decode('ascii')
+
+
+def get_monogram_log_probabilities(n_grams: NGrams) -> np.ndarray:
+    frequencies = n_grams[1].db
+    floor = min(frequencies.values()) / 10
+    return np.log10([frequencies.get(chr(ord('a') + c), floor) for c in range(26)])
+
+
+def guess_column_shifts(codes: np.ndarray, period: int, variant: str, log_probabilities: np.ndarray) -> np.ndarray:
+    # best shift of every column on its own, by letter frequencies alone
+    counts = np.zeros((period, 26))
+    np.add.at(counts, (np.arange(len(codes)) % period, codes), 1)
+    shifts = np.arange(26)[:, None]
+    letters = np.arange(26)[None, :]
+    plain = (shifts - letters) % 26 if variant == 'beaufort' else (letters - shifts) % 26
+    return np.argmax(counts @ log_probabilities[plain].T, axis=1)
+
+
+_worker = None
+
+
+def _init_worker(n_grams, codes, variant):
+    global _worker
+    _worker = (n_grams, codes, variant)
+
+
+def best_column_shift(column: int, key: np.ndarray):
+    # the shift of one column that scores best with every other column held fixed
+    n_grams, codes, variant = _worker
+    key = key.copy()
+    best = None
+    for shift in range(26):
+        key[column] = shift
+        score = n_grams.score(to_text(decrypt(codes, key, variant)))
+        if best is None or score > best[0]:
+            best = (score, shift)
+    return best
+
+
+def refine_key(n_grams, codes, key, variant, executor=None):
+    # coordinate ascent on the n-gram fitness of the whole plaintext; every round finds the
+    # best shift of all the columns at once, in parallel, then applies the changes together,
+    # or only the best single one if together they do worse
+    score = n_grams.score(to_text(decrypt(codes, key, variant)))
+    while True:
+        columns = range(len(key))
+        keys = [key] * len(key)
+        if executor:
+            results = list(executor.map(best_column_shift, columns, keys))
+        else:
+            results = [best_column_shift(column, key) for column in columns]
+
+        changed = [(column_score, column, shift) for column, (column_score, shift) in enumerate(results) if shift != key[column] and column_score > score]
+        if not changed:
+            return key, score
+
+        combined = key.copy()
+        for _, column, shift in changed:
+            combined[column] = shift
+        combined_score = n_grams.score(to_text(decrypt(codes, combined, variant)))
+        best_score, column, shift = max(changed)
+        if combined_score >= best_score:
+            key, score = combined, combined_score
+        else:
+            key = key.copy()
+            key[column] = shift
+            score = best_score
+
+
+def restore_text(ciphertext: str, plaintext: str) -> str:
+    # put the decrypted letters back among the ciphertext's other characters
+    letters = iter(plaintext)
+    return ''.join(next(letters) if 'a' <= ch <= 'z' else ch for ch in ciphertext)
+
+
+def break_vigenere(ciphertext: str, n_grams: NGrams, variant: str = 'vigenere', max_period: int = 20,
+                   period: Optional[int] = None, jobs: int = 1) -> VigenereResult:
+    start = time.time()
+    ciphertext = ciphertext.lower()
+    codes = encode(''.join(ch for ch in ciphertext if 'a' <= ch <= 'z'))
+    statistics = get_period_statistics(codes[:STATISTICS_LETTERS], min(max_period, max(len(codes) // 2, 1)))
+    period = period or guess_period(statistics)
+
+    key = guess_column_shifts(codes, period, variant, get_monogram_log_probabilities(n_grams))
+    n_grams.load()
+    if jobs > 1 and period > 1 and len(codes) >= PARALLEL_MIN_LETTERS:
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, period),
+            mp_context=get_mp_context(),
+            initializer=_init_worker,
+            initargs=(n_grams, codes, variant),
+        ) as executor:
+            key, score = refine_key(n_grams, codes, key, variant, executor)
+    else:
+        _init_worker(n_grams, codes, variant)
+        key, score = refine_key(n_grams, codes, key, variant)
+
+    plaintext = restore_text(ciphertext, to_text(decrypt(codes, key, variant)))
+    return VigenereResult(variant, period, to_text(key), score, plaintext, time.time() - start, statistics)
+
+
+def format_statistics(statistics: PeriodStatistics, period: int) -> str:
+    buffer = [BAR, f"{'period':>6} {'ioc':>8} {'kasiski':>8}"]
+    for p, ioc, kasiski in zip(statistics.periods, statistics.ioc, statistics.kasiski):
+        marker = ' <' if p == period else ''
+        buffer.append(f'{p:>6} {ioc:>8.4f} {kasiski:>8.3f}{marker}')
+    buffer.append(BAR)
+    return os.linesep.join(buffer)
+
+
+def format_result(result: VigenereResult) -> str:
+    return os.linesep.join((
+        BAR,
+        f'{result.variant} key: {result.key} (period {result.period})',
+        f'score: {result.score}',
+        f'time to solution: {round(result.elapsed, 2)}s',
+        BAR,
+        result.plaintext,
+        BAR,
+    ))
@@ -1,3 +1,9 @@
+import os
+import zipfile
+from argparse import ArgumentParser
+
+import numpy as np
+
 key = (
   (0b000, 'e',),
   (0b001, 'h',),
@@ -9,24 +15,97 @@ key = (
   (0b111, 't',),
 )
 
-def char_to_bin(ch: str):
-    for binary, c in key:
-        if c == ch:
-            return binary
-        
-def bin_to_char(binary: int):
-    for b, char in key:
-        if b == binary:
-            return char
+BITS = 3
+# packed words are uint64, 3 bits per letter
+MAX_LENGTH = 64 // BITS
+
+WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'p12', 'ciphie', 'data', 'english_words.txt.zip')
+
+alphabet = ''.join(c for _, c in key)
+
+# byte -> 3 bit code, 0xff for bytes outside the alphabet
+char_to_bin_table = np.full(256, 0xff, dtype=np.uint8)
+for binary, c in key:
+    char_to_bin_table[ord(c)] = binary
+bin_to_char_table = np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)
+
+arg_parser = ArgumentParser(description='XOR two-time pad search over the 3-bit alphabet ' + alphabet)
+arg_parser.add_argument('ciphertexts', nargs='*', default=['KITLKE'], help='Ciphertexts encrypted with the same key (default: KITLKE)')
+arg_parser.add_argument('-p', '--plaintexts', nargs='+', help='Print the key each of these plaintexts gives for the first ciphertext (default: thrill tiller, without -w)')
+arg_parser.add_argument('-w', '--words', action='store_true', help='Search the dictionary for words giving a common key for all the ciphertexts')
+arg_parser.add_argument('--max-words', type=int, help='Only use this many of the most common words')
+
 
 def find_key_for(ciphertext: str, plaintext: str):
-    return ''.join(
-        bin_to_char(char_to_bin(ci_char) ^ char_to_bin(pl_char)) 
-        for ci_char, pl_char in zip(ciphertext, plaintext)
-      )
-        
-ciphertext = 'KITLKE'
-plaintexts = ['thrill', 'tiller',]
-
-for plaintext in plaintexts:
-    print(find_key_for(ciphertext.lower(), plaintext))
\ No newline at end of file
+    if len(ciphertext) != len(plaintext):
+        raise ValueError(f'"{plaintext}" is not as long as the ciphertext "{ciphertext}"')
+    return decode(encode(ciphertext) ^ encode(plaintext))
+
+def encode(text: str):
+    codes = char_to_bin_table[np.frombuffer(text.lower().encode('ascii'), dtype=np.uint8)]
+    if (codes == 0xff).any():
+        raise ValueError(f'"{text}" has letters outside {alphabet}')
+    return codes
+
+def decode(codes):
+    return bin_to_char_table[codes].tobytes().decode('ascii')
+
+def pack(codes):
+    # rows of 3 bit codes into one integer per row, first letter in the highest bits
+    codes = np.atleast_2d(codes).astype(np.uint64)
+    shifts = np.arange(codes.shape[1] - 1, -1, -1, dtype=np.uint64) * np.uint64(BITS)
+    return (codes << shifts).sum(axis=1, dtype=np.uint64)
+
+def unpack(packed: int, length: int):
+    return decode(np.array([(packed >> (BITS * i)) & 0b111 for i in range(length - 1, -1, -1)], dtype=np.uint8))
+
+def load_words(length: int, max_words=None):
+    # dictionary words spelled only with the 8 letters, as packed codes
+    words = []
+    with zipfile.ZipFile(WORDS_FILE) as z, z.open(z.namelist()[0]) as f:
+        for line_number, line in enumerate(f):
+            if max_words is not None and line_number >= max_words:
+                break
+            word = line.split(b' ')[0].strip().lower()
+            if len(word) == length and not word.translate(None, alphabet.encode('ascii')):
+                words.append(word.decode('ascii'))
+    if not words:
+        return words, np.zeros(0, dtype=np.uint64)
+    return words, pack(np.stack([encode(word) for word in words]))
+
+def find_common_keys(ciphertexts, packed_words):
+    # a key is common when some word encrypts to every ciphertext under it: XOR every word
+    # with every ciphertext in bulk and intersect the resulting key sets
+    common = None
+    for ciphertext in ciphertexts:
+        keys = packed_words ^ pack(encode(ciphertext))[0]
+        common = keys if common is None else np.intersect1d(common, keys)
+
+    matches = []
+    length = len(ciphertexts[0])
+    for packed_key in np.unique(common):
+        row = []
+        for ciphertext in ciphertexts:
+            # XOR is its own inverse, so the word is the key XOR the ciphertext
+            row.append(unpack(int(packed_key ^ pack(encode(ciphertext))[0]), length))
+        matches.append((unpack(int(packed_key), length), row))
+    return matches
+
+
+if __name__ == '__main__':
+    args = arg_parser.parse_args()
+    ciphertexts = [ciphertext.lower() for ciphertext in args.ciphertexts]
+
+    if args.words:
+        length = len(ciphertexts[0])
+        if length > MAX_LENGTH or any(len(ciphertext) != length for ciphertext in ciphertexts):
+            arg_parser.error(f'ciphertexts must all have the same length, at most {MAX_LENGTH}')
+        _, packed_words = load_words(length, args.max_words)
+        for found_key, plaintexts in find_common_keys(ciphertexts, packed_words):
+            print(found_key, ' '.join(plaintexts))
+    else:
+        for plaintext in args.plaintexts or ['thrill', 'tiller']:
+            try:
+                print(find_key_for(ciphertexts[0], plaintext))
+            except ValueError as e:
+                arg_parser.error(str(e))
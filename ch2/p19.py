@@ -1,3 +1,8 @@
+import json
+from argparse import ArgumentParser
+
+import numpy as np
+
 key = {
   123: 'once',
   199: 'or',
@@ -11,5 +16,94 @@ key = {
 message = [242, 554, 650, 464, 532, 749, 567]
 additives = [119, 222, 199, 231, 333, 547, 346]
 
-for word, additive in zip(message, additives):
-    print(key[word - additive] + ' ', end='')
\ No newline at end of file
+# positions with at most this many surviving additives list them instead of a single "?"
+MAX_SHOWN_CANDIDATES = 3
+
+arg_parser = ArgumentParser(description='Additive book cipher depth attack')
+arg_parser.add_argument('-i', '--input', help='JSON file of {"codebook": {codeword: word}, "messages": [{"offset": n, "groups": [...]}], "modulus": m}. Without it, the sample message is decoded with its known additives')
+
+
+class Codebook:
+    def __init__(self, codebook, modulus=None):
+        self.words = {int(codeword): word for codeword, word in codebook.items()}
+        # sorted, so membership of a whole array of candidates is one searchsorted
+        self.codewords = np.array(sorted(self.words), dtype=np.int64)
+        self.modulus = modulus
+
+    def subtract(self, groups, additives):
+        differences = np.asarray(groups, dtype=np.int64) - additives
+        return differences % self.modulus if self.modulus else differences
+
+    def is_valid(self, codewords):
+        positions = np.searchsorted(self.codewords, codewords)
+        positions = np.minimum(positions, len(self.codewords) - 1)
+        return self.codewords[positions] == codewords
+
+    def decode(self, codeword):
+        return self.words.get(int(codeword))
+
+
+def get_depth(messages):
+    # the cipher groups of all the messages at each position of the additive stream
+    length = max(m.get('offset', 0) + len(m['groups']) for m in messages)
+    depth = [[] for _ in range(length)]
+    for index, m in enumerate(messages):
+        for i, group in enumerate(m['groups']):
+            depth[m.get('offset', 0) + i].append((index, group))
+    return depth
+
+
+def find_additives(codebook: Codebook, column):
+    # every additive that turns the first group into a codeword, kept only while every other
+    # group at the same position still decodes to a codeword under it
+    if not column:
+        return None
+    first = column[0][1]
+    # distinct codewords give distinct additives, reduced or not
+    candidates = codebook.subtract(first, codebook.codewords)
+    # the fewest candidates survive the groups checked first, which makes the rest cheaper, but
+    # even a single one left has to hold for every group
+    for _, group in column[1:]:
+        candidates = candidates[codebook.is_valid(codebook.subtract(group, candidates))]
+        if not len(candidates):
+            break
+    return candidates
+
+
+def attack(codebook: Codebook, messages):
+    depth = get_depth(messages)
+    stream = [find_additives(codebook, column) for column in depth]
+
+    decoded = [[] for _ in messages]
+    for candidates, column in zip(stream, depth):
+        for index, group in column:
+            # distinct additives give distinct codewords, so there are as many readings as candidates;
+            # none left means the groups at this position contradict every additive
+            if not len(candidates) or len(candidates) > MAX_SHOWN_CANDIDATES:
+                decoded[index].append('?')
+                continue
+            words = [codebook.decode(codeword) for codeword in codebook.subtract(group, candidates)]
+            if None in words:
+                decoded[index].append('?')
+                continue
+            words.sort()
+            decoded[index].append(words[0] if len(words) == 1 else '[' + '|'.join(words) + ']')
+    return stream, decoded
+
+
+if __name__ == '__main__':
+    args = arg_parser.parse_args()
+    if not args.input:
+        for word, additive in zip(message, additives):
+            print(key[word - additive] + ' ', end='')
+    else:
+        with open(args.input, 'r') as f:
+            data = json.load(f)
+        codebook = Codebook(data['codebook'], data.get('modulus'))
+        stream, decoded = attack(codebook, data['messages'])
+
+        solved = sum(1 for candidates in stream if candidates is not None and len(candidates) == 1)
+        print(f'{solved}/{len(stream)} additives recovered')
+        print('additives:', ' '.join(str(c[0]) if c is not None and len(c) == 1 else '?' for c in stream))
+        for words in decoded:
+            print(' '.join(words))